@@ -0,0 +1,47 @@
+import bz2
+import gzip
+import lzma
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import mkv_info.library_xml
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DATA_DIR = Path("data")
+
+CODECS = {
+    "plain": lambda data: data,
+    "gz": gzip.compress,
+    "xz": lzma.compress,
+    "bz2": bz2.compress,
+}
+if zstandard is not None:
+    CODECS["zst"] = zstandard.ZstdCompressor().compress
+
+
+def main(data_file: Path = DATA_DIR / "videodb_min.xml", repeat: int = 5):
+    plain = data_file.read_bytes()
+    print(f"{'codec':<6} {'ratio':>7} {'MB/s':>8} {'best s':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, compress in CODECS.items():
+            path = Path(tmp) / f"videodb.xml.{name}"
+            path.write_bytes(compress(plain))
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                mkv_info.library_xml.XML_Parser.parse_file(path)
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            ratio = len(plain) / path.stat().st_size
+            throughput = len(plain) / best / 1e6
+            print(f"{name:<6} {ratio:>7.1f} {throughput:>8.1f} {best:>8.3f}")
+
+
+if __name__ == "__main__":
+    main(*(Path(arg) for arg in sys.argv[1:2]))
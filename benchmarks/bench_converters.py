@@ -0,0 +1,44 @@
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import mkv_info.library_xml
+
+DATA_DIR = Path("data")
+
+
+class Uncached(mkv_info.library_xml.XML_Parser):
+    pass
+
+
+for field, converter in Uncached.converters.items():
+    Uncached.register_converter(field, converter.func, maxsize=0)
+
+
+def _time(parser, root: ET.Element, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        parser.cache_clear()
+        start = time.perf_counter()
+        parser.parse_video_database(root)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(data_file: Path = DATA_DIR / "videodb_min.xml", repeat: int = 20):
+    root = ET.parse(data_file).getroot()
+    cached = mkv_info.library_xml.XML_Parser
+    print(f"{'converters':<10} {'best ms':>8}")
+    for name, parser in (("uncached", Uncached), ("cached", cached)):
+        print(f"{name:<10} {_time(parser, root, repeat) * 1e3:>8.2f}")
+
+    print(f"\n{'field':<18} {'hits':>6} {'misses':>6} {'size':>5}")
+    for field, info in cached.cache_stats().items():
+        print(
+            f"{field:<18} {info.hits:>6} {info.misses:>6} {info.currsize:>5}"
+        )
+
+
+if __name__ == "__main__":
+    main(*(Path(arg) for arg in sys.argv[1:2]))
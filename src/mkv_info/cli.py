@@ -0,0 +1,336 @@
+# %%
+
+from __future__ import annotations
+
+
+import argparse
+import os
+import sys
+import typing
+
+if typing.TYPE_CHECKING:
+    import concurrent.futures
+    from . import records
+
+
+BATCH_SIZE = 16
+
+
+def _nfo_paths(source: str) -> typing.List[str]:
+    from . import library_dir
+
+    paths = library_dir.find_nfo_files(source)
+    if not paths and any(
+        os.path.splitext(name)[1].lower() in library_dir.MEDIA_SUFFIXES
+        for _, _, files in os.walk(source)
+        for name in files
+    ):
+        print(
+            f"{source}: media files without .nfo metadata are not probed",
+            file=sys.stderr,
+        )
+    return paths
+
+
+def _nfo_records(parsed: typing.Iterable) -> typing.Iterator[records.Record]:
+    from . import records
+
+    for item in parsed:
+        if item is not None:
+            show, entry = item
+            yield records.entry_record(entry, show=show)
+
+
+def _nfo_batch(paths: typing.List[str]) -> typing.List[records.Record]:
+    from . import library_dir
+
+    return list(_nfo_records(map(library_dir.parse_nfo, paths)))
+
+
+def _block_batch(blocks: typing.List[bytes]) -> typing.List[records.Record]:
+    from . import library_xml
+    from . import records
+
+    parse = library_xml.XML_Parser.parse_entry_block
+    return list(records.iter_records(map(parse, blocks)))
+
+
+def _batches(
+    items: typing.Iterable, size: int
+) -> typing.Iterator[typing.List]:
+    import itertools
+
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def _bounded_map(
+    executor: concurrent.futures.Executor,
+    func: typing.Callable[[typing.List], typing.List[records.Record]],
+    batches: typing.Iterable[typing.List],
+    window: int,
+) -> typing.Iterator[records.Record]:
+    import collections
+
+    pending: typing.Deque[concurrent.futures.Future] = collections.deque()
+    for batch in batches:
+        pending.append(executor.submit(func, batch))
+        if len(pending) >= window:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def _iter_source_records(
+    source: str,
+    executor: typing.Optional[concurrent.futures.Executor] = None,
+    jobs: int = 1,
+) -> typing.Iterator[records.Record]:
+    from . import library_xml
+    from . import records
+
+    if executor is None:
+        if os.path.isdir(source):
+            from . import library_dir
+
+            yield from _nfo_records(
+                map(library_dir.parse_nfo, _nfo_paths(source))
+            )
+        else:
+            yield from records.iter_records(
+                library_xml.XML_Parser.iter_entries(source)
+            )
+        return
+
+    if os.path.isdir(source):
+        func: typing.Callable = _nfo_batch
+        items: typing.Iterable = _nfo_paths(source)
+    else:
+        func = _block_batch
+        items = library_xml.iter_entry_blocks(source)
+    yield from _bounded_map(
+        executor, func, _batches(items, BATCH_SIZE), 4 * jobs
+    )
+
+
+class SourceError(Exception):
+    pass
+
+
+def _guarded(
+    source: str, items: typing.Iterable[records.Record]
+) -> typing.Iterator[records.Record]:
+    import xml.etree.ElementTree as ET
+
+    try:
+        yield from items
+    except (OSError, ET.ParseError) as error:
+        reason = getattr(error, "strerror", None) or error
+        raise SourceError(f"{source}: {reason}") from error
+
+
+def iter_records(
+    sources: typing.Sequence[str], jobs: int = 1
+) -> typing.Iterator[records.Record]:
+    if jobs == 1:
+        for source in sources:
+            yield from _guarded(source, _iter_source_records(source))
+        return
+
+    import concurrent.futures
+
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        for source in sources:
+            yield from _guarded(
+                source, _iter_source_records(source, executor, jobs)
+            )
+
+
+class JSONLinesWriter:
+    def __init__(self, stream: typing.TextIO, fields: typing.Sequence[str]):
+        import json
+
+        self._dumps = json.JSONEncoder(ensure_ascii=False).encode
+        self._stream = stream
+        self._fields = fields
+
+    def write(self, record: records.Record) -> None:
+        row = {field: record[field] for field in self._fields}
+        self._stream.write(self._dumps(row) + "\n")
+
+
+class CSVWriter:
+    def __init__(self, stream: typing.TextIO, fields: typing.Sequence[str]):
+        import csv
+
+        self._writer = csv.writer(stream)
+        self._writer.writerow(fields)
+        self._fields = fields
+
+    def write(self, record: records.Record) -> None:
+        self._writer.writerow(
+            [_csv_value(record[field]) for field in self._fields]
+        )
+
+
+def _csv_value(value: typing.Any) -> typing.Any:
+    if isinstance(value, list):
+        return "|".join("" if v is None else str(v) for v in value)
+    return value
+
+
+WRITERS = {"jsonl": JSONLinesWriter, "csv": CSVWriter}
+
+
+def run_parse(args: argparse.Namespace) -> int:
+    from . import records
+
+    fields = args.fields.split(",") if args.fields else records.FIELDS
+    unknown = [field for field in fields if field not in records.FIELDS]
+    if unknown:
+        print(f"unknown fields: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    writer = WRITERS[args.format](sys.stdout, fields)
+    for count, record in enumerate(iter_records(args.sources, jobs), 1):
+        writer.write(record)
+        if count % BATCH_SIZE == 0:
+            sys.stdout.flush()
+    sys.stdout.flush()
+    return 0
+
+
+def run_watch(args: argparse.Namespace) -> int:
+    import json
+    from . import records
+    from . import watch
+
+    def emit(changes: typing.List[watch.Change]) -> None:
+        for change in changes:
+            show = None if change.series is None else change.series.title
+            record = records.entry_record(change.entry, show=show)
+            record.update(action=change.action, path=change.path)
+            print(json.dumps(record, ensure_ascii=False), flush=True)
+
+    if args.polling:
+        backend: watch.Backend = watch.PollingBackend(args.root)
+    else:
+        backend = watch.default_backend(args.root)
+    watcher = watch.LibraryWatcher(
+        args.root, backend=backend, debounce=args.debounce
+    )
+    watcher.subscribe(emit)
+    watcher.scan()
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run_serve(args: argparse.Namespace) -> int:
+    from . import library_xml
+    from . import service
+
+    library = service.LibraryService(
+        lambda: library_xml.XML_Parser.parse_file(args.source),
+        cache_size=args.cache_size,
+    )
+    address = args.socket or (args.host, args.port)
+    server = service.make_server(library, address)
+    print(f"serving {args.source} on {address}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="mkv-info", description="get info from mkv files"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print timing statistics to stderr",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parse = commands.add_parser(
+        "parse", help="stream titles of a library as JSON Lines or CSV"
+    )
+    parse.add_argument(
+        "sources",
+        nargs="+",
+        help=(
+            "videodb export (optionally compressed) or directory of Kodi "
+            ".nfo files; media files without an .nfo are not probed"
+        ),
+    )
+    parse.add_argument("--format", choices=sorted(WRITERS), default="jsonl")
+    parse.add_argument(
+        "--fields", help="comma separated list of fields to emit"
+    )
+    parse.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="parse titles of each source in parallel; 0 uses every CPU",
+    )
+    parse.set_defaults(func=run_parse)
+
+    watch = commands.add_parser(
+        "watch", help="follow a library directory and report changes"
+    )
+    watch.add_argument("root", help="directory of .nfo and media files")
+    watch.add_argument("--debounce", type=float, default=0.5)
+    watch.add_argument(
+        "--polling",
+        action="store_true",
+        help="poll the tree instead of using inotify",
+    )
+    watch.set_defaults(func=run_watch)
+
+    serve = commands.add_parser(
+        "serve", help="answer library queries over HTTP"
+    )
+    serve.add_argument("source", help="videodb export (optionally compressed)")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--socket", help="listen on a Unix socket instead")
+    serve.add_argument("--cache-size", type=int, default=256)
+    serve.set_defaults(func=run_serve)
+    return parser
+
+
+def _run(args: argparse.Namespace) -> int:
+    if not args.profile:
+        return args.func(args)
+
+    import cProfile
+    import pstats
+
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(args.func, args)
+    finally:
+        stats = pstats.Stats(profile, stream=sys.stderr)
+        stats.sort_stats("cumulative").print_stats(25)
+
+
+def main(argv: typing.Optional[typing.Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return _run(args)
+    except BrokenPipeError:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    except (SourceError, OSError) as error:
+        print(f"mkv-info: {error}", file=sys.stderr)
+        return 2
@@ -0,0 +1,92 @@
+# %%
+
+from __future__ import annotations
+
+
+import bz2
+import contextlib
+import gzip
+import io
+import lzma
+import os
+import typing
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+Source: typing.TypeAlias = typing.Union[str, os.PathLike, typing.BinaryIO]
+
+MAGIC: typing.Dict[str, bytes] = {
+    "gzip": b"\x1f\x8b",
+    "xz": b"\xfd7zXZ\x00",
+    "bz2": b"BZh",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+
+
+class _Prefixed(io.RawIOBase):
+    def __init__(self, head: bytes, stream: typing.BinaryIO):
+        self._head = head
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._head:
+            size = min(len(buffer), len(self._head))
+            buffer[:size] = self._head[:size]
+            self._head = self._head[size:]
+            return size
+        data = self._stream.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def detect_codec(stream: io.BufferedReader) -> typing.Optional[str]:
+    head = stream.peek(6)[:6]
+    for codec, magic in MAGIC.items():
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def decompress_stream(
+    stream: typing.BinaryIO, codec: typing.Optional[str]
+) -> typing.BinaryIO:
+    if codec is None:
+        return stream
+    if codec == "gzip":
+        return typing.cast(typing.BinaryIO, gzip.GzipFile(fileobj=stream))
+    if codec == "xz":
+        return typing.cast(typing.BinaryIO, lzma.LZMAFile(stream))
+    if codec == "bz2":
+        return typing.cast(typing.BinaryIO, bz2.BZ2File(stream))
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError(
+                "reading .zst exports requires the 'zstandard' package"
+            )
+        return zstandard.ZstdDecompressor().stream_reader(stream)
+    raise ValueError(f"unknown codec {codec!r}")
+
+
+@contextlib.contextmanager
+def open_source(source: Source) -> typing.Iterator[typing.BinaryIO]:
+    with contextlib.ExitStack() as stack:
+        if isinstance(source, (str, os.PathLike)):
+            raw: typing.BinaryIO = stack.enter_context(open(source, "rb"))
+        else:
+            raw = source
+        if not hasattr(raw, "peek"):
+            head = raw.read(len(max(MAGIC.values(), key=len)))
+            raw = typing.cast(
+                typing.BinaryIO, io.BufferedReader(_Prefixed(head, raw))
+            )
+        codec = detect_codec(typing.cast(io.BufferedReader, raw))
+        stream = decompress_stream(raw, codec)
+        if stream is not raw:
+            stack.callback(stream.close)
+        yield stream
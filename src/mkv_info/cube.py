@@ -0,0 +1,237 @@
+# %%
+
+from __future__ import annotations
+
+
+import dataclasses
+import itertools
+import typing
+from . import media_library
+
+Entry: typing.TypeAlias = typing.Union[
+    media_library.Movie, media_library.Episode
+]
+Dimension: typing.TypeAlias = typing.Callable[
+    [Entry, typing.Optional[media_library.Series]], typing.Iterable
+]
+Cell: typing.TypeAlias = typing.Tuple[typing.Any, ...]
+
+
+def _unique(values: typing.Iterable) -> typing.Tuple:
+    found = tuple(dict.fromkeys(values))
+    return found or (None,)
+
+
+def kind(
+    entry: Entry, series: typing.Optional[media_library.Series]
+) -> typing.Tuple:
+    is_movie = isinstance(entry, media_library.Movie)
+    return ("movie" if is_movie else "episode",)
+
+
+def codec(
+    entry: Entry, series: typing.Optional[media_library.Series]
+) -> typing.Tuple:
+    return _unique(v.codec.lower() for v in entry.video_streams if v.codec)
+
+
+def resolution_bucket(
+    width: typing.Optional[int], height: typing.Optional[int]
+) -> typing.Optional[str]:
+    if width is None and height is None:
+        return None
+    width, height = width or 0, height or 0
+    if width >= 3200 or height >= 1800:
+        return "2160p"
+    if width >= 1800 or height >= 1000:
+        return "1080p"
+    if width >= 1200 or height >= 700:
+        return "720p"
+    return "sd"
+
+
+def resolution(
+    entry: Entry, series: typing.Optional[media_library.Series]
+) -> typing.Tuple:
+    return _unique(
+        resolution_bucket(v.width, v.height) for v in entry.video_streams
+    )
+
+
+def language(
+    entry: Entry, series: typing.Optional[media_library.Series]
+) -> typing.Tuple:
+    return _unique(a.language for a in entry.audio_streams if a.language)
+
+
+def sub_language(
+    entry: Entry, series: typing.Optional[media_library.Series]
+) -> typing.Tuple:
+    return _unique(s.language for s in entry.sub_streams if s.language)
+
+
+def year(
+    entry: Entry, series: typing.Optional[media_library.Series]
+) -> typing.Tuple:
+    if entry.year is None and series is not None:
+        return (series.year,)
+    return (entry.year,)
+
+
+def show(
+    entry: Entry, series: typing.Optional[media_library.Series]
+) -> typing.Tuple:
+    return (None if series is None else series.title,)
+
+
+DIMENSIONS: typing.Dict[str, Dimension] = {
+    "kind": kind,
+    "codec": codec,
+    "resolution": resolution,
+    "language": language,
+    "sub_language": sub_language,
+    "year": year,
+    "show": show,
+}
+
+DEFAULT_DIMENSIONS = (
+    "kind",
+    "codec",
+    "resolution",
+    "language",
+    "year",
+    "show",
+)
+
+
+@dataclasses.dataclass
+class Measure:
+    count: int = 0
+    seconds: float = 0.0
+
+    @property
+    def hours(self) -> float:
+        return self.seconds / 3600
+
+
+Touched: typing.TypeAlias = typing.List[
+    typing.Tuple[typing.Dict[Cell, Measure], Cell]
+]
+
+
+class Cube:
+    def __init__(
+        self,
+        dimensions: typing.Sequence[str] = DEFAULT_DIMENSIONS,
+        extra: typing.Optional[typing.Dict[str, Dimension]] = None,
+    ) -> None:
+        registry = dict(DIMENSIONS, **(extra or {}))
+        unknown = [name for name in dimensions if name not in registry]
+        if unknown:
+            raise KeyError(f"unknown dimensions: {', '.join(unknown)}")
+        self.dimensions = tuple(dimensions)
+        self._functions = [registry[name] for name in self.dimensions]
+        self._added: typing.Dict[
+            int, typing.List[typing.Tuple[Entry, Touched, float]]
+        ] = {}
+        self._cuboids: typing.Dict[
+            typing.Tuple[int, ...], typing.Dict[Cell, Measure]
+        ] = {
+            subset: {}
+            for size in range(len(self.dimensions) + 1)
+            for subset in itertools.combinations(
+                range(len(self.dimensions)), size
+            )
+        }
+
+    @classmethod
+    def build(
+        cls,
+        database: media_library.VideoDatabase,
+        dimensions: typing.Sequence[str] = DEFAULT_DIMENSIONS,
+        extra: typing.Optional[typing.Dict[str, Dimension]] = None,
+    ) -> Cube:
+        cube = cls(dimensions, extra)
+        for movie in database.movies:
+            cube.add(movie)
+        for series in database.series:
+            for episode in series.episodes:
+                cube.add(episode, series)
+        return cube
+
+    def _apply(
+        self,
+        touched: Touched,
+        seconds: float,
+        sign: int,
+    ) -> None:
+        for cells, cell in touched:
+            measure = cells.get(cell)
+            if measure is None:
+                measure = cells[cell] = Measure()
+            measure.count += sign
+            measure.seconds += sign * seconds
+            if measure.count == 0:
+                del cells[cell]
+
+    def add(
+        self,
+        entry: Entry,
+        series: typing.Optional[media_library.Series] = None,
+    ) -> None:
+        values = [func(entry, series) for func in self._functions]
+        seconds = (
+            0.0 if entry.duration is None else entry.duration.total_seconds()
+        )
+        touched = [
+            (cells, cell)
+            for subset, cells in self._cuboids.items()
+            for cell in itertools.product(*(values[i] for i in subset))
+        ]
+        self._apply(touched, seconds, 1)
+        self._added.setdefault(id(entry), []).append(
+            (entry, touched, seconds)
+        )
+
+    def remove(
+        self,
+        entry: Entry,
+        series: typing.Optional[media_library.Series] = None,
+    ) -> None:
+        added = self._added.get(id(entry))
+        if not added:
+            raise KeyError(f"{entry.title!r} was never added to the cube")
+        _, touched, seconds = added.pop()
+        if not added:
+            del self._added[id(entry)]
+        self._apply(touched, seconds, -1)
+
+    def _subset(self, names: typing.Iterable[str]) -> typing.Tuple[int, ...]:
+        try:
+            return tuple(sorted({self.dimensions.index(n) for n in names}))
+        except ValueError:
+            raise KeyError(f"cube has no dimension among {sorted(names)}")
+
+    def get(self, **filters: typing.Any) -> Measure:
+        subset = self._subset(filters)
+        cell = tuple(filters[self.dimensions[i]] for i in subset)
+        return self._cuboids[subset].get(cell, Measure())
+
+    def group_by(
+        self, *names: str, **filters: typing.Any
+    ) -> typing.Dict[Cell, Measure]:
+        subset = self._subset((*names, *filters))
+        order = [subset.index(self.dimensions.index(n)) for n in names]
+        wanted = [
+            (subset.index(self.dimensions.index(n)), value)
+            for n, value in filters.items()
+        ]
+        return {
+            tuple(cell[i] for i in order): measure
+            for cell, measure in self._cuboids[subset].items()
+            if all(cell[i] == value for i, value in wanted)
+        }
+
+    @property
+    def total(self) -> Measure:
+        return self._cuboids[()].get((), Measure())
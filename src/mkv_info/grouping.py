@@ -0,0 +1,161 @@
+# %%
+
+from __future__ import annotations
+
+
+import heapq
+import itertools
+import os
+import pickle
+import tempfile
+import typing
+import xml.etree.ElementTree as ET
+from . import compressed
+from . import library_xml
+from . import media_library
+from . import merge
+
+Key: typing.TypeAlias = typing.Tuple[typing.Any, ...]
+Item: typing.TypeAlias = typing.Tuple[Key, int, typing.Optional[str], bytes]
+Pair: typing.TypeAlias = typing.Tuple[
+    typing.Optional[str], media_library.Episode
+]
+
+MEMORY_BUDGET = 64 << 20
+FANOUT = 64
+
+
+def episode_sort_key(
+    show: typing.Optional[str], episode: media_library.Episode
+) -> Key:
+    return (
+        show is not None,
+        merge.normalize_title(show),
+        episode.season is None,
+        episode.season or 0,
+        episode.episode is None,
+        episode.episode or 0,
+    )
+
+
+def iter_episode_pairs(
+    sources: typing.Iterable[compressed.Source],
+) -> typing.Iterator[Pair]:
+    for source in sources:
+        with compressed.open_source(source) as stream:
+            stack: typing.List[ET.Element] = []
+            show: typing.Optional[str] = None
+            for event, element in ET.iterparse(stream, ("start", "end")):
+                if event == "start":
+                    if element.tag == "tvshow":
+                        show = None
+                    stack.append(element)
+                    continue
+                stack.pop()
+                parent = stack[-1] if stack else None
+                if element.tag == "title" and parent is not None:
+                    if parent.tag == "tvshow":
+                        show = element.text
+                elif element.tag == "episodedetails":
+                    title = library_xml.get_text(element, "showtitle")
+                    yield title or show, library_xml.XML_Parser.parse_episode(
+                        element
+                    )
+                    if parent is not None:
+                        parent.remove(element)
+                elif element.tag in ("movie", "tvshow") and parent is not None:
+                    parent.remove(element)
+
+
+def _read_run(run: typing.BinaryIO) -> typing.Iterator[Item]:
+    run.seek(0)
+    while True:
+        try:
+            yield pickle.load(run)
+        except EOFError:
+            return
+
+
+class EpisodeGrouper:
+    def __init__(
+        self,
+        memory_budget: int = MEMORY_BUDGET,
+        tempdir: typing.Optional[typing.Union[str, os.PathLike]] = None,
+        fanout: int = FANOUT,
+    ) -> None:
+        if fanout < 2:
+            raise ValueError("fanout must be at least 2")
+        self.memory_budget = memory_budget
+        self.tempdir = tempdir
+        self.fanout = fanout
+        self.spilled = 0
+        self._buffer: typing.List[Item] = []
+        self._buffered = 0
+        self._runs: typing.List[typing.BinaryIO] = []
+        self._sequence = itertools.count()
+
+    def add(
+        self, show: typing.Optional[str], episode: media_library.Episode
+    ) -> None:
+        blob = pickle.dumps(episode, pickle.HIGHEST_PROTOCOL)
+        key = episode_sort_key(show, episode)
+        self._buffer.append((key, next(self._sequence), show, blob))
+        self._buffered += len(blob)
+        if self._buffered >= self.memory_budget:
+            self._spill()
+
+    def _write_run(self, items: typing.Iterable[Item]) -> typing.BinaryIO:
+        run = tempfile.TemporaryFile(dir=self.tempdir)
+        for item in items:
+            pickle.dump(item, run, pickle.HIGHEST_PROTOCOL)
+        self.spilled += 1
+        return run
+
+    def _spill(self) -> None:
+        self._buffer.sort()
+        self._runs.append(self._write_run(self._buffer))
+        self._buffer = []
+        self._buffered = 0
+
+    def _merge_runs(self) -> None:
+        while len(self._runs) > self.fanout:
+            batch, self._runs = (
+                self._runs[: self.fanout],
+                self._runs[self.fanout :],
+            )
+            merged = self._write_run(heapq.merge(*map(_read_run, batch)))
+            for run in batch:
+                run.close()
+            self._runs.append(merged)
+
+    def __iter__(self) -> typing.Iterator[media_library.Series]:
+        self._buffer.sort()
+        try:
+            self._merge_runs()
+            items = heapq.merge(
+                *map(_read_run, self._runs), iter(self._buffer)
+            )
+            for _, group in itertools.groupby(items, lambda i: i[0][:2]):
+                run = list(group)
+                yield media_library.Series(
+                    title=min(run, key=lambda i: i[1])[2],
+                    episodes=[pickle.loads(item[3]) for item in run],
+                )
+        finally:
+            for run in self._runs:
+                run.close()
+            self._runs = []
+            self._buffer = []
+            self._buffered = 0
+
+
+def group_episodes(
+    pairs: typing.Iterable[Pair],
+    memory_budget: int = MEMORY_BUDGET,
+    tempdir: typing.Optional[typing.Union[str, os.PathLike]] = None,
+    fanout: int = FANOUT,
+) -> typing.Iterator[media_library.Series]:
+    grouper = EpisodeGrouper(memory_budget, tempdir, fanout)
+    for show, episode in pairs:
+        grouper.add(show, episode)
+    yield from grouper
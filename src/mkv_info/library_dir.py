@@ -0,0 +1,76 @@
+# %%
+
+from __future__ import annotations
+
+
+import os
+import typing
+import xml.etree.ElementTree as ET
+from . import library_xml
+from . import media_library
+
+MEDIA_SUFFIXES: typing.FrozenSet[str] = frozenset(
+    (".mkv", ".mp4", ".m4v", ".avi", ".ts", ".m2ts")
+)
+
+NfoEntry: typing.TypeAlias = typing.Tuple[
+    typing.Optional[str],
+    typing.Union[media_library.Movie, media_library.Episode],
+]
+
+
+def find_nfo_files(root: typing.Union[str, os.PathLike]) -> typing.List[str]:
+    found = []
+    for directory, subdirs, files in os.walk(root):
+        subdirs.sort()
+        found.extend(
+            os.path.join(directory, name)
+            for name in sorted(files)
+            if name.lower().endswith(".nfo") and name != "tvshow.nfo"
+        )
+    return found
+
+
+def nfo_for(path: typing.Union[str, os.PathLike]) -> typing.Optional[str]:
+    stem, suffix = os.path.splitext(os.fspath(path))
+    if suffix.lower() == ".nfo":
+        return None if os.path.basename(stem) == "tvshow" else stem + suffix
+    if suffix.lower() in MEDIA_SUFFIXES:
+        return stem + ".nfo"
+    return None
+
+
+def parse_nfo(
+    path: typing.Union[str, os.PathLike]
+) -> typing.Optional[NfoEntry]:
+    try:
+        root = ET.parse(path).getroot()
+    except (ET.ParseError, OSError):
+        return None
+    directory = os.path.dirname(os.path.abspath(path))
+    entry: typing.Union[media_library.Movie, media_library.Episode]
+    if root.tag == "movie":
+        show = None
+        entry = library_xml.XML_Parser.parse_movie(root)
+    elif root.tag == "episodedetails":
+        show = library_xml.get_text(root, "showtitle")
+        if show is None:
+            show = parse_show_title(directory)
+        if show is None:
+            show = parse_show_title(os.path.dirname(directory))
+        entry = library_xml.XML_Parser.parse_episode(root)
+    else:
+        return None
+    if entry.path is None:
+        entry.path = os.path.join(directory, "")
+    if entry.filename_and_path is None:
+        entry.filename_and_path = os.path.abspath(path)
+    return show, entry
+
+
+def parse_show_title(directory: str) -> typing.Optional[str]:
+    try:
+        root = ET.parse(os.path.join(directory, "tvshow.nfo")).getroot()
+    except (ET.ParseError, OSError):
+        return None
+    return library_xml.get_text(root, "title")
@@ -0,0 +1,491 @@
+# %%
+
+from __future__ import annotations
+
+
+import contextlib
+import dataclasses
+import io
+import mmap
+import os
+import re
+import typing
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+from . import library_dir
+from . import library_xml
+from . import media_library
+from . import merge
+from . import records
+
+Entry: typing.TypeAlias = typing.Union[
+    media_library.Movie, media_library.Episode
+]
+Target: typing.TypeAlias = typing.Union[str, os.PathLike, typing.TextIO]
+
+BUFFER_SIZE = 1 << 20
+DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n'
+
+TOKEN_PATTERN = re.compile(rb"<(/?)(movie|tvshow|episodedetails)>")
+FILEINFO_PATTERN = re.compile(rb"[ \t]*<fileinfo>.*?</fileinfo>", re.DOTALL)
+TITLE_PATTERN = re.compile(rb"<title>(.*?)</title>", re.DOTALL)
+STREAMDETAILS_PATTERN = re.compile(
+    r"<streamdetails>(.*?)</streamdetails>", re.DOTALL
+)
+STREAM_PATTERN = re.compile(
+    r"([ \t]*)<(video|audio|subtitle)>(.*?)</\2>(\n?)", re.DOTALL
+)
+
+STREAM_FIELDS: typing.Dict[str, typing.Tuple[str, ...]] = {
+    "video": ("codec", "width", "height"),
+    "audio": ("codec", "language", "channels"),
+    "subtitle": ("language",),
+}
+STREAM_PARSERS: typing.Dict[str, str] = {
+    "video": "parse_video_stream",
+    "audio": "parse_audio_stream",
+    "subtitle": "parse_sub_stream",
+}
+FIELD_PATTERNS: typing.Dict[str, typing.Pattern[str]] = {
+    name: re.compile(
+        rf"([ \t]*)<{name}(?:\s*/>|>.*?</{name}>)(\n?)", re.DOTALL
+    )
+    for names in STREAM_FIELDS.values()
+    for name in names
+}
+
+
+class XMLWriter:
+    def __init__(
+        self,
+        stream: typing.TextIO,
+        prefix: str = "",
+        indent: str = "\t",
+    ) -> None:
+        self._stream = stream
+        self._prefix = prefix
+        self._indent = indent
+        self._level = 0
+        self._parts: typing.List[str] = []
+
+    def _line(self, text: str) -> None:
+        indent = self._indent * self._level
+        self._parts.append(f"{self._prefix}{indent}{text}\n")
+
+    def start(self, tag: str) -> None:
+        self._line(f"<{tag}>")
+        self._level += 1
+
+    def end(self, tag: str) -> None:
+        self._level -= 1
+        self._line(f"</{tag}>")
+
+    def element(self, tag: str, value: typing.Any) -> None:
+        if value is None:
+            return
+        self._line(f"<{tag}>{escape(str(value))}</{tag}>")
+
+    def raw(self, text: str) -> None:
+        self._parts.append(text)
+
+    def flush(self) -> None:
+        self._stream.write("".join(self._parts))
+        self._parts.clear()
+
+
+def _stream_kinds(
+    streams: media_library.StreamDetails,
+) -> typing.Dict[str, typing.Sequence[typing.Any]]:
+    return {
+        "video": streams.videos,
+        "audio": streams.audios,
+        "subtitle": streams.subs,
+    }
+
+
+def _runtime(entry: Entry) -> typing.Optional[int]:
+    if entry.duration is None:
+        return None
+    return round(entry.duration.total_seconds() / 60)
+
+
+def write_stream(writer: XMLWriter, kind: str, stream: typing.Any) -> None:
+    writer.start(kind)
+    for name in STREAM_FIELDS[kind]:
+        writer.element(name, getattr(stream, name))
+    writer.end(kind)
+
+
+def write_fileinfo(
+    writer: XMLWriter, streams: media_library.StreamDetails
+) -> None:
+    writer.start("fileinfo")
+    writer.start("streamdetails")
+    for kind, items in _stream_kinds(streams).items():
+        for stream in items:
+            write_stream(writer, kind, stream)
+    writer.end("streamdetails")
+    writer.end("fileinfo")
+
+
+def write_movie(writer: XMLWriter, movie: media_library.Movie) -> None:
+    writer.start("movie")
+    writer.element("title", movie.title)
+    writer.element("year", movie.year)
+    writer.element("runtime", _runtime(movie))
+    write_fileinfo(writer, movie.streams)
+    writer.element("path", movie.path)
+    writer.element("filenameandpath", movie.filename_and_path)
+    writer.end("movie")
+
+
+def write_episode(
+    writer: XMLWriter,
+    episode: media_library.Episode,
+    show: typing.Optional[str] = None,
+) -> None:
+    writer.start("episodedetails")
+    writer.element("title", episode.title)
+    writer.element("showtitle", show)
+    writer.element("season", episode.season)
+    writer.element("episode", episode.episode)
+    writer.element("year", episode.year)
+    writer.element("runtime", _runtime(episode))
+    write_fileinfo(writer, episode.streams)
+    writer.element("path", episode.path)
+    writer.element("filenameandpath", episode.filename_and_path)
+    writer.end("episodedetails")
+
+
+def write_series(writer: XMLWriter, series: media_library.Series) -> None:
+    writer.start("tvshow")
+    writer.element("title", series.title)
+    writer.element("showtitle", series.title)
+    writer.element("year", series.year)
+    writer.element("season", series.season)
+    writer.element("episode", series.episode)
+    writer.flush()
+    for episode in series.episodes:
+        write_episode(writer, episode, series.title)
+        writer.flush()
+    writer.end("tvshow")
+
+
+@contextlib.contextmanager
+def _open_target(target: Target) -> typing.Iterator[typing.TextIO]:
+    if isinstance(target, io.TextIOBase):
+        yield target
+        return
+    with open(
+        target, "w", encoding="utf-8", newline="\n", buffering=BUFFER_SIZE
+    ) as stream:
+        yield stream
+
+
+def write_video_database(source: records.Source, target: Target) -> None:
+    if isinstance(source, media_library.VideoDatabase):
+        source = [*source.movies, *source.series]
+    with _open_target(target) as stream:
+        writer = XMLWriter(stream)
+        writer.raw(DECLARATION)
+        writer.start("videodb")
+        writer.element("version", 1)
+        for item in source:
+            if isinstance(item, media_library.Series):
+                write_series(writer, item)
+            else:
+                write_movie(writer, item)
+            writer.flush()
+        writer.end("videodb")
+        writer.flush()
+
+
+def write_nfo(
+    entry: Entry, target: Target, show: typing.Optional[str] = None
+) -> None:
+    with _open_target(target) as stream:
+        writer = XMLWriter(stream)
+        writer.raw(DECLARATION)
+        if isinstance(entry, media_library.Movie):
+            write_movie(writer, entry)
+        else:
+            write_episode(writer, entry, show)
+        writer.flush()
+
+
+def splice_nfo(
+    path: typing.Union[str, os.PathLike], entry: Entry
+) -> bool:
+    with open(path, "rb") as stream:
+        data = stream.read()
+    if isinstance(entry, media_library.Movie):
+        tag, key = b"movie", None
+    else:
+        tag, key = b"episodedetails", merge.episode_key(None, entry)
+    block_start: typing.Optional[int] = None
+    for token in TOKEN_PATTERN.finditer(data):
+        if token.group(2) != tag:
+            continue
+        if not token.group(1):
+            block_start = token.start()
+            continue
+        if block_start is None:
+            continue
+        if key is not None:
+            try:
+                element = ET.fromstring(data[block_start : token.end()])
+            except ET.ParseError:
+                continue
+            episode = library_xml.XML_Parser.parse_episode(element)
+            if merge.episode_key(None, episode) != key:
+                continue
+        start, end, replacement = _fileinfo_edit(
+            data, block_start, token.start(), entry.streams
+        )
+        temporary = os.fspath(path) + ".tmp"
+        with open(temporary, "wb") as out:
+            out.write(data[:start])
+            out.write(replacement)
+            out.write(data[end:])
+        os.replace(temporary, path)
+        return True
+    return False
+
+
+def write_nfo_files(
+    source: records.Source,
+    mapping: typing.Optional[
+        typing.Callable[[str], typing.Optional[str]]
+    ] = None,
+    overwrite: bool = False,
+) -> typing.List[str]:
+    written = []
+    for show, entry in records.iter_entries(source):
+        local = entry.filename_and_path
+        if local and mapping is not None:
+            local = mapping(local)
+        target = library_dir.nfo_for(local) if local else None
+        if target is None:
+            continue
+        if not overwrite and os.path.exists(target):
+            if not splice_nfo(target, entry):
+                continue
+        else:
+            write_nfo(entry, target, show)
+        written.append(target)
+    return written
+
+
+@dataclasses.dataclass
+class SpliceReport:
+    replaced: int = 0
+    unmatched: typing.List[merge.Key] = dataclasses.field(
+        default_factory=list
+    )
+
+
+def _fileinfo(streams: media_library.StreamDetails, prefix: str) -> bytes:
+    stream = io.StringIO()
+    writer = XMLWriter(stream, prefix)
+    write_fileinfo(writer, streams)
+    writer.flush()
+    return stream.getvalue().encode("utf-8")
+
+
+def _render_stream(kind: str, stream: typing.Any, prefix: str) -> str:
+    out = io.StringIO()
+    writer = XMLWriter(out, prefix)
+    write_stream(writer, kind, stream)
+    writer.flush()
+    return out.getvalue()
+
+
+def _apply_edits(
+    text: str, edits: typing.List[typing.Tuple[int, int, str]]
+) -> str:
+    for start, end, replacement in sorted(edits, reverse=True):
+        text = text[:start] + replacement + text[end:]
+    return text
+
+
+def _update_stream(
+    kind: str, match: typing.Match[str], stream: typing.Any
+) -> str:
+    indent, body = match.group(1), match.group(3)
+    parse = getattr(library_xml.XML_Parser, STREAM_PARSERS[kind])
+    try:
+        old = parse(ET.fromstring(f"<{kind}>{body}</{kind}>"))
+    except ET.ParseError:
+        return _render_stream(kind, stream, indent)
+    edits = []
+    for name in STREAM_FIELDS[kind]:
+        value = getattr(stream, name)
+        if getattr(old, name) == value:
+            continue
+        line = ""
+        if value is not None:
+            line = f"<{name}>{escape(str(value))}</{name}>"
+        found = FIELD_PATTERNS[name].search(body)
+        if found is not None:
+            if line:
+                line = found.group(1) + line + found.group(2)
+            edits.append((found.start(), found.end(), line))
+        elif line:
+            close = body.rfind("\n") + 1
+            if close and not body[close:].strip():
+                edits.append((close, close, f"{indent}\t{line}\n"))
+            else:
+                edits.append((len(body), len(body), line))
+    body = _apply_edits(body, edits)
+    return f"{indent}<{kind}>{body}</{kind}>{match.group(4)}"
+
+
+def _update_fileinfo(
+    text: str, streams: media_library.StreamDetails
+) -> typing.Optional[str]:
+    details = STREAMDETAILS_PATTERN.search(text)
+    if details is None:
+        return None
+    wanted = _stream_kinds(streams)
+    order = list(wanted)
+    matches = list(STREAM_PATTERN.finditer(text, *details.span(1)))
+    edits = []
+    seen = dict.fromkeys(order, 0)
+    last: typing.Dict[str, int] = {}
+    for match in matches:
+        kind = match.group(2)
+        index = seen[kind]
+        seen[kind] += 1
+        last[kind] = match.end()
+        if index < len(wanted[kind]):
+            updated = _update_stream(kind, match, wanted[kind][index])
+        else:
+            updated = ""
+        if updated != match.group():
+            edits.append((match.start(), match.end(), updated))
+
+    closing = details.end(1)
+    line = text.rfind("\n", 0, closing) + 1
+    if text[line:closing].strip():
+        fallback, lead, prefix = closing, "\n", ""
+    else:
+        fallback, lead, prefix = line, "", text[line:closing] + "\t"
+    if matches:
+        prefix = matches[0].group(1)
+    for position, kind in enumerate(order):
+        extra = wanted[kind][seen[kind] :]
+        if not extra:
+            continue
+        if kind in last:
+            start, head = last[kind], ""
+        else:
+            later = [
+                m.start()
+                for m in matches
+                if order.index(m.group(2)) > position
+            ]
+            start, head = (later[0], "") if later else (fallback, lead)
+        rendered = "".join(_render_stream(kind, s, prefix) for s in extra)
+        edits.append((start, start, head + rendered))
+    return _apply_edits(text, edits)
+
+
+def _fileinfo_edit(
+    data: typing.Union[bytes, mmap.mmap],
+    block_start: int,
+    block_end: int,
+    streams: media_library.StreamDetails,
+) -> typing.Tuple[int, int, bytes]:
+    found = FILEINFO_PATTERN.search(data, block_start, block_end)
+    if found is not None:
+        updated = _update_fileinfo(found.group().decode("utf-8"), streams)
+        if updated is not None:
+            return found.start(), found.end(), updated.encode("utf-8")
+        indent = re.match(rb"[ \t]*", found.group()).group()
+        replacement = _fileinfo(streams, indent.decode("utf-8"))
+        return found.start(), found.end(), replacement.rstrip(b"\n")
+    start = data.rfind(b"\n", 0, block_end) + 1
+    indent = data[start:block_end]
+    if indent.strip():
+        return block_end, block_end, b"\n" + _fileinfo(streams, "")
+    return start, start, _fileinfo(streams, indent.decode("utf-8") + "\t")
+
+
+def _block_key(
+    block: bytes, show: typing.Optional[str]
+) -> typing.Optional[merge.Key]:
+    try:
+        element = ET.fromstring(block)
+    except ET.ParseError:
+        return None
+    if element.tag == "movie":
+        return merge.movie_key(library_xml.XML_Parser.parse_movie(element))
+    show = library_xml.get_text(element, "showtitle") or show
+    episode = library_xml.XML_Parser.parse_episode(element)
+    return merge.episode_key(show, episode)
+
+
+def _show_title(data: bytes) -> typing.Optional[str]:
+    match = TITLE_PATTERN.search(data)
+    if match is None:
+        return None
+    return ET.fromstring(b"<t>" + match.group(1) + b"</t>").text
+
+
+def splice_fileinfo(
+    source: typing.Union[str, os.PathLike],
+    target: typing.Union[str, os.PathLike],
+    updates: records.Source,
+) -> SpliceReport:
+    pending: typing.Dict[merge.Key, media_library.StreamDetails] = {}
+    for show, entry in records.iter_entries(updates):
+        if isinstance(entry, media_library.Movie):
+            pending[merge.movie_key(entry)] = entry.streams
+        else:
+            pending[merge.episode_key(show, entry)] = entry.streams
+
+    report = SpliceReport()
+    matched: typing.Set[merge.Key] = set()
+    with open(source, "rb") as stream, open(
+        target, "wb", buffering=BUFFER_SIZE
+    ) as out:
+        if os.fstat(stream.fileno()).st_size == 0:
+            data: typing.Union[bytes, mmap.mmap] = b""
+        else:
+            data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            position = 0
+            show_start: typing.Optional[int] = None
+            show: typing.Optional[str] = None
+            block_start = 0
+            for token in TOKEN_PATTERN.finditer(data):
+                closing, tag = token.group(1), token.group(2)
+                if tag == b"tvshow":
+                    show_start = None if closing else token.end()
+                    show = None
+                    continue
+                if not closing:
+                    if show_start is not None:
+                        show = _show_title(data[show_start : token.start()])
+                        show_start = None
+                    block_start = token.start()
+                    continue
+                block = data[block_start : token.end()]
+                key = _block_key(block, None if tag == b"movie" else show)
+                streams = pending.get(key)
+                if streams is None:
+                    continue
+                matched.add(key)
+                start, end, replacement = _fileinfo_edit(
+                    data, block_start, token.start(), streams
+                )
+                out.write(data[position:start])
+                out.write(replacement)
+                position = end
+                report.replaced += 1
+            out.write(data[position:])
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+    report.unmatched = [key for key in pending if key not in matched]
+    return report
@@ -5,15 +5,138 @@ from __future__ import annotations
 
 import dataclasses
 import datetime
+import functools
 import re
 import typing
 import xml.etree.ElementTree as ET
+from . import compressed
 from . import media_library
 
 data: typing.TypeAlias = typing.Optional[ET.Element]
 
+CACHE_SIZE = 1024
+
+BLOCK_PATTERN = re.compile(rb"<(movie|tvshow)>")
+BLOCK_TAIL = len(b"<tvshow>")
+HEADER_SIZE = 256
+DECLARATION_PATTERN = re.compile(rb"(?:\xef\xbb\xbf)?\s*(<\?xml[^>]*\?>)")
+
+CLOCK_PATTERN = re.compile(
+    r"(?P<hours>\d+):(?P<minutes>\d{1,2})(?::(?P<seconds>\d{1,2}))?"
+)
+UNITS_PATTERN = re.compile(
+    r"(?:(?P<hours>\d+)\s*h(?:ours?|rs?)?\s*)?"
+    r"(?:(?P<minutes>\d+)\s*m(?:in(?:utes?|s)?)?\s*)?"
+    r"(?:(?P<seconds>\d+)\s*s(?:ec(?:onds?|s)?)?)?",
+    re.IGNORECASE,
+)
+
+
+def to_text(text: str) -> typing.Optional[str]:
+    return text
+
+
+def to_int(text: str) -> typing.Optional[int]:
+    text = text.strip()
+    if not text.isdigit():
+        return None
+    return int(text)
+
+
+def to_duration(text: str) -> typing.Optional[datetime.timedelta]:
+    text = text.strip()
+    if text.isdigit():
+        return datetime.timedelta(minutes=int(text))
+    match = CLOCK_PATTERN.fullmatch(text)
+    if match is None:
+        match = UNITS_PATTERN.fullmatch(text)
+    if match is None or not any(match.groups()):
+        return None
+    parts = match.groupdict()
+    return datetime.timedelta(
+        **{unit: int(value) for unit, value in parts.items() if value}
+    )
+
+
+def to_seconds(text: str) -> typing.Optional[datetime.timedelta]:
+    seconds = to_int(text)
+    if seconds is None:
+        return None
+    return datetime.timedelta(seconds=seconds)
+
+
+class Converter:
+    def __init__(
+        self,
+        func: typing.Callable[[str], typing.Any],
+        maxsize: typing.Optional[int] = CACHE_SIZE,
+    ) -> None:
+        self.func = func
+        self._cached = functools.lru_cache(maxsize)(func)
+        self.cache_info = self._cached.cache_info
+        self.cache_clear = self._cached.cache_clear
+
+    def __call__(self, text: typing.Optional[str]) -> typing.Any:
+        if text is None:
+            return None
+        return self._cached(text)
+
 
 class XML_Parser(media_library.LibraryFactory):
+    converters: typing.ClassVar[typing.Dict[str, Converter]] = {
+        "codec": Converter(to_text),
+        "language": Converter(to_text),
+        "channels": Converter(to_int),
+        "width": Converter(to_int),
+        "height": Converter(to_int),
+        "year": Converter(to_int),
+        "season": Converter(to_int),
+        "episode": Converter(to_int),
+        "runtime": Converter(to_duration),
+        "durationinseconds": Converter(to_seconds),
+    }
+
+    @classmethod
+    def register_converter(
+        cls,
+        field: str,
+        func: typing.Callable[[str], typing.Any],
+        maxsize: typing.Optional[int] = CACHE_SIZE,
+    ) -> None:
+        cls.converters = {**cls.converters, field: Converter(func, maxsize)}
+
+    @classmethod
+    def convert(cls, element: ET.Element, tag: str) -> typing.Any:
+        data = element.find(tag)
+        if data is None or data.text is None:
+            return None
+        return cls.converters[tag](data.text)
+
+    @classmethod
+    def cache_stats(cls) -> typing.Dict[str, functools._CacheInfo]:
+        return {
+            field: converter.cache_info()
+            for field, converter in cls.converters.items()
+        }
+
+    @classmethod
+    def cache_clear(cls) -> None:
+        for converter in cls.converters.values():
+            converter.cache_clear()
+
+    @classmethod
+    def parse_duration(
+        cls, data: ET.Element
+    ) -> typing.Optional[datetime.timedelta]:
+        duration = cls.convert(data, "runtime")
+        if duration is not None:
+            return duration
+        found = [
+            cls.convert(video, "durationinseconds")
+            for video in data.iterfind("fileinfo/streamdetails/video")
+        ]
+        return max((d for d in found if d is not None), default=None)
+
     @classmethod
     def parse_stream_details(cls, data) -> media_library.StreamDetails:
 
@@ -42,9 +165,9 @@ class XML_Parser(media_library.LibraryFactory):
     def parse_video_stream(
         cls, stream: ET.Element
     ) -> media_library.VideoStream:
-        codec = get_text(stream, "codec")
-        height = get_int(stream, "height")
-        width = get_int(stream, "width")
+        codec = cls.convert(stream, "codec")
+        height = cls.convert(stream, "height")
+        width = cls.convert(stream, "width")
 
         return media_library.VideoStream(
             codec=codec, width=width, height=height,
@@ -54,35 +177,40 @@ class XML_Parser(media_library.LibraryFactory):
     def parse_audio_stream(
         cls, stream: ET.Element
     ) -> media_library.AudioStream:
-        codec: typing.Optional[str] = get_text(stream, "codec")
-        language: typing.Optional[str] = get_text(stream, "language")
-        channels: typing.Optional[int] = get_int(stream, "channels")
+        codec: typing.Optional[str] = cls.convert(stream, "codec")
+        language: typing.Optional[str] = cls.convert(stream, "language")
+        channels: typing.Optional[int] = cls.convert(stream, "channels")
         return media_library.AudioStream(
             codec=codec, language=language, channels=channels,
         )
 
     @classmethod
     def parse_sub_stream(cls, stream: ET.Element) -> media_library.SubStream:
-        language: typing.Optional[str] = get_text(stream, "language")
+        language: typing.Optional[str] = cls.convert(stream, "language")
         return media_library.SubStream(language=language)
 
     @classmethod
     def parse_movie(cls, data: ET.Element) -> media_library.Movie:
         title = get_text(data, "title")
-        year = get_int(data, "year")
-        duration = get_duration(data, "runtime")
+        year = cls.convert(data, "year")
+        duration = cls.parse_duration(data)
         streams = cls.parse_stream_details(data.find("fileinfo"))
         return media_library.Movie(
-            title=title, year=year, duration=duration, streams=streams
+            title=title,
+            year=year,
+            duration=duration,
+            streams=streams,
+            path=get_text(data, "path"),
+            filename_and_path=get_text(data, "filenameandpath"),
         )
 
     @classmethod
     def parse_episode(cls, data: ET.Element) -> media_library.Episode:
         title = get_text(data, "title")
-        year = get_int(data, "year")
-        duration = get_duration(data, "runtime")
-        season = get_int(data, "season")
-        episode = get_int(data, "episode")
+        year = cls.convert(data, "year")
+        duration = cls.parse_duration(data)
+        season = cls.convert(data, "season")
+        episode = cls.convert(data, "episode")
         streams = cls.parse_stream_details(data.find("fileinfo"))
         return media_library.Episode(
             title=title,
@@ -91,6 +219,8 @@ class XML_Parser(media_library.LibraryFactory):
             season=season,
             episode=episode,
             streams=streams,
+            path=get_text(data, "path"),
+            filename_and_path=get_text(data, "filenameandpath"),
         )
 
     @classmethod
@@ -119,6 +249,101 @@ class XML_Parser(media_library.LibraryFactory):
             series=[cls.parse_series(tag) for tag in data.iter("tvshow")],
         )
 
+    @classmethod
+    def iter_entries(
+        cls, source: compressed.Source
+    ) -> typing.Iterator[
+        typing.Union[media_library.Movie, media_library.Series]
+    ]:
+        with compressed.open_source(source) as stream:
+            depth = 0
+            root = None
+            for event, element in ET.iterparse(stream, ("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if root is None:
+                        root = element
+                    continue
+                depth -= 1
+                if depth != 1:
+                    continue
+                if element.tag == "movie":
+                    yield cls.parse_movie(element)
+                elif element.tag == "tvshow":
+                    yield cls.parse_series(element)
+                root.clear()
+
+    @classmethod
+    def parse_entry_block(
+        cls, block: bytes
+    ) -> typing.Union[media_library.Movie, media_library.Series]:
+        element = ET.fromstring(block)
+        if element.tag == "movie":
+            return cls.parse_movie(element)
+        return cls.parse_series(element)
+
+    @classmethod
+    def parse_file(
+        cls, source: compressed.Source
+    ) -> media_library.VideoDatabase:
+        library = media_library.VideoDatabase(movies=[], series=[])
+        for entry in cls.iter_entries(source):
+            if isinstance(entry, media_library.Movie):
+                library.movies.append(entry)
+            else:
+                library.series.append(entry)
+        return library
+
+
+def iter_entry_blocks(
+    source: compressed.Source, chunk_size: int = 1 << 20
+) -> typing.Iterator[bytes]:
+    declaration: typing.Optional[bytes] = None
+    with compressed.open_source(source) as stream:
+        pending = b""
+        parts: typing.List[bytes] = []
+        closing = tail = b""
+        while True:
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            if parts:
+                end = (tail + chunk).find(closing)
+                if end < 0:
+                    parts.append(chunk)
+                    tail = (tail + chunk)[1 - len(closing) :]
+                    if eof:
+                        return
+                    continue
+                end += len(closing) - len(tail)
+                parts.append(chunk[:end])
+                yield declaration + b"".join(parts)
+                parts = []
+                chunk = chunk[end:]
+            pending += chunk
+            if declaration is None:
+                if len(pending) < HEADER_SIZE and not eof:
+                    continue
+                match = DECLARATION_PATTERN.match(pending)
+                declaration = b"" if match is None else match.group(1)
+            position = 0
+            while True:
+                match = BLOCK_PATTERN.search(pending, position)
+                if match is None:
+                    position = max(position, len(pending) - BLOCK_TAIL)
+                    break
+                closing = b"</" + match.group(1) + b">"
+                end = pending.find(closing, match.end())
+                if end < 0:
+                    parts.append(pending[match.start() :])
+                    tail = parts[0][1 - len(closing) :]
+                    position = len(pending)
+                    break
+                position = end + len(closing)
+                yield declaration + pending[match.start() : position]
+            pending = pending[position:]
+            if eof:
+                return
+
 
 def get_text(element: ET.Element, tag: str) -> typing.Optional[str]:
     data = element.find(tag)
@@ -129,9 +354,9 @@ def get_text(element: ET.Element, tag: str) -> typing.Optional[str]:
 
 def get_int(element: ET.Element, tag: str) -> typing.Optional[int]:
     data = element.find(tag)
-    if data is None or data.text is None or not data.text.isalnum():
+    if data is None or data.text is None:
         return None
-    return int(data.text)
+    return to_int(data.text)
 
 
 def get_duration(
@@ -140,10 +365,4 @@ def get_duration(
     data = element.find(tag)
     if data is None or data.text is None:
         return None
-    if data.text.isalnum():
-        return datetime.timedelta(minutes=int(data.text))
-    pat = re.compile(r"(?P<minutes>\d+) min")
-    if (match := pat.match(data.text)) is None:
-        print(repr(data.text))
-        return None
-    return datetime.timedelta(minutes=int(match.group("minutes")))
+    return to_duration(data.text)
@@ -0,0 +1,443 @@
+# %%
+
+from __future__ import annotations
+
+
+import dataclasses
+import datetime
+import math
+import os
+import statistics
+import struct
+import typing
+from . import media_library
+
+EBML = 0x1A45DFA3
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMESTAMP_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_NUMBER = 0xD7
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+CUES = 0x1C53BB6B
+CUE_POINT = 0xBB
+CUE_TIME = 0xB3
+CUE_TRACK_POSITIONS = 0xB7
+CUE_CLUSTER_POSITION = 0xF1
+CLUSTER = 0x1F43B675
+TIMESTAMP = 0xE7
+SIMPLE_BLOCK = 0xA3
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+BLOCK_DURATION = 0x9B
+
+TRACK_KINDS = {1: "video", 2: "audio", 0x11: "subtitle"}
+UNKNOWN_SIZE = -1
+HEADER_PROBE = 12
+Z_95 = 1.959964
+
+
+class MatroskaError(ValueError):
+    pass
+
+
+def read_vint(
+    data: bytes, offset: int, keep_marker: bool = False
+) -> typing.Tuple[int, int]:
+    if offset >= len(data):
+        raise MatroskaError("truncated element header")
+    first = data[offset]
+    length = 8 - first.bit_length() + 1
+    if first == 0 or offset + length > len(data):
+        raise MatroskaError("invalid variable size integer")
+    value = first if keep_marker else first & ((1 << (8 - length)) - 1)
+    all_ones = value == (1 << (8 - length)) - 1
+    for byte in data[offset + 1 : offset + length]:
+        value = (value << 8) | byte
+        all_ones = all_ones and byte == 0xFF
+    if all_ones and not keep_marker:
+        return UNKNOWN_SIZE, offset + length
+    return value, offset + length
+
+
+def read_header(data: bytes, offset: int) -> typing.Tuple[int, int, int]:
+    element_id, offset = read_vint(data, offset, keep_marker=True)
+    size, offset = read_vint(data, offset)
+    return element_id, size, offset
+
+
+def iter_children(
+    data: bytes, start: int = 0, end: typing.Optional[int] = None
+) -> typing.Iterator[typing.Tuple[int, int, int]]:
+    end = len(data) if end is None else end
+    offset = start
+    while offset < end:
+        element_id, size, offset = read_header(data, offset)
+        if size == UNKNOWN_SIZE:
+            size = end - offset
+        yield element_id, offset, min(size, end - offset)
+        offset += size
+
+
+def read_uint(data: bytes) -> int:
+    return int.from_bytes(data, "big")
+
+
+def read_float(data: bytes) -> float:
+    if len(data) == 4:
+        return struct.unpack(">f", data)[0]
+    if len(data) == 8:
+        return struct.unpack(">d", data)[0]
+    return 0.0
+
+
+@dataclasses.dataclass(frozen=True)
+class Track:
+    number: int
+    kind: str
+    codec: typing.Optional[str] = None
+
+
+@dataclasses.dataclass
+class ClusterSample:
+    timestamp: int
+    duration: typing.Optional[int]
+    bytes_per_track: typing.Dict[int, int]
+    block_timestamps: typing.List[int]
+    last_block_duration: typing.Optional[int] = None
+
+
+@dataclasses.dataclass
+class ProbeResult:
+    tracks: typing.List[Track]
+    bitrates: typing.Dict[int, media_library.BitrateEstimate]
+    duration: typing.Optional[datetime.timedelta] = None
+    duration_error: typing.Optional[datetime.timedelta] = None
+    declared_duration: typing.Optional[datetime.timedelta] = None
+    clusters_sampled: int = 0
+    bytes_read: int = 0
+
+
+class MatroskaFile:
+    def __init__(self, path: typing.Union[str, os.PathLike]):
+        self.path = os.fspath(path)
+        self._fd = os.open(self.path, os.O_RDONLY)
+        self.size = os.fstat(self._fd).st_size
+        self.bytes_read = 0
+        self.timestamp_scale = 1_000_000
+        self.declared_duration: typing.Optional[float] = None
+        self.tracks: typing.List[Track] = []
+        self.cues: typing.List[typing.Tuple[int, int]] = []
+        self._read_segment()
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+    def __enter__(self) -> MatroskaFile:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def pread(self, offset: int, size: int) -> bytes:
+        data = os.pread(self._fd, size, offset)
+        self.bytes_read += len(data)
+        return data
+
+    def header_at(self, offset: int) -> typing.Tuple[int, int, int]:
+        element_id, size, start = read_header(
+            self.pread(offset, HEADER_PROBE), 0
+        )
+        return element_id, size, offset + start
+
+    def _read_segment(self) -> None:
+        element_id, size, start = self.header_at(0)
+        if element_id != EBML:
+            raise MatroskaError(f"{self.path} is not an EBML file")
+        element_id, size, start = self.header_at(start + size)
+        if element_id != SEGMENT:
+            raise MatroskaError(f"{self.path} has no segment")
+        self.segment_start = start
+        self.segment_end = (
+            self.size if size == UNKNOWN_SIZE else min(self.size, start + size)
+        )
+        positions = self._top_level_positions()
+        if INFO in positions:
+            self._parse_info(self._read_element(positions[INFO]))
+        if TRACKS in positions:
+            self._parse_tracks(self._read_element(positions[TRACKS]))
+        if CUES in positions:
+            self._parse_cues(self._read_element(positions[CUES]))
+
+    def _read_element(self, offset: int) -> bytes:
+        _, size, start = self.header_at(offset)
+        return self.pread(start, size)
+
+    def _top_level_positions(self) -> typing.Dict[int, int]:
+        positions: typing.Dict[int, int] = {}
+        offset = self.segment_start
+        while offset < self.segment_end:
+            element_id, size, start = self.header_at(offset)
+            if element_id == SEEK_HEAD:
+                seeks = self._parse_seek_head(self.pread(start, size))
+                for seek_id, position in seeks.items():
+                    positions.setdefault(seek_id, position)
+            else:
+                positions.setdefault(element_id, offset)
+            if size == UNKNOWN_SIZE:
+                break
+            if {INFO, TRACKS, CUES} <= positions.keys():
+                break
+            offset = start + size
+        return positions
+
+    def _parse_seek_head(self, data: bytes) -> typing.Dict[int, int]:
+        seeks = {}
+        for element_id, start, size in iter_children(data):
+            if element_id != SEEK:
+                continue
+            seek_id = position = None
+            for child, child_start, child_size in iter_children(
+                data, start, start + size
+            ):
+                value = data[child_start : child_start + child_size]
+                if child == SEEK_ID:
+                    seek_id = read_uint(value)
+                elif child == SEEK_POSITION:
+                    position = read_uint(value)
+            if seek_id is not None and position is not None:
+                seeks[seek_id] = self.segment_start + position
+        return seeks
+
+    def _parse_info(self, data: bytes) -> None:
+        for element_id, start, size in iter_children(data):
+            value = data[start : start + size]
+            if element_id == TIMESTAMP_SCALE:
+                self.timestamp_scale = read_uint(value)
+            elif element_id == DURATION:
+                self.declared_duration = read_float(value)
+
+    def _parse_tracks(self, data: bytes) -> None:
+        for element_id, start, size in iter_children(data):
+            if element_id != TRACK_ENTRY:
+                continue
+            number = kind = codec = None
+            for child, child_start, child_size in iter_children(
+                data, start, start + size
+            ):
+                value = data[child_start : child_start + child_size]
+                if child == TRACK_NUMBER:
+                    number = read_uint(value)
+                elif child == TRACK_TYPE:
+                    kind = TRACK_KINDS.get(read_uint(value), "other")
+                elif child == CODEC_ID:
+                    codec = value.decode("ascii", "replace")
+            if number is not None:
+                self.tracks.append(Track(number, kind or "other", codec))
+
+    def _parse_cues(self, data: bytes) -> None:
+        found: typing.Dict[int, int] = {}
+        for element_id, start, size in iter_children(data):
+            if element_id != CUE_POINT:
+                continue
+            time = None
+            for child, child_start, child_size in iter_children(
+                data, start, start + size
+            ):
+                value = data[child_start : child_start + child_size]
+                if child == CUE_TIME:
+                    time = read_uint(value)
+                elif child == CUE_TRACK_POSITIONS and time is not None:
+                    for grandchild, g_start, g_size in iter_children(
+                        data, child_start, child_start + child_size
+                    ):
+                        if grandchild == CUE_CLUSTER_POSITION:
+                            position = read_uint(
+                                data[g_start : g_start + g_size]
+                            )
+                            found.setdefault(position, time)
+        self.cues = sorted(
+            (time, self.segment_start + position)
+            for position, time in found.items()
+        )
+
+    def read_cluster(self, offset: int) -> typing.Tuple[ClusterSample, int]:
+        element_id, size, start = self.header_at(offset)
+        if element_id != CLUSTER or size == UNKNOWN_SIZE:
+            raise MatroskaError(f"no sized cluster at offset {offset}")
+        data = self.pread(start, size)
+        timestamp = 0
+        bytes_per_track: typing.Dict[int, int] = {}
+        block_timestamps = []
+        last_duration = None
+        for child, child_start, child_size in iter_children(data):
+            value = data[child_start : child_start + child_size]
+            if child == TIMESTAMP:
+                timestamp = read_uint(value)
+            elif child == SIMPLE_BLOCK:
+                self._add_block(value, bytes_per_track, block_timestamps)
+                last_duration = None
+            elif child == BLOCK_GROUP:
+                for grandchild, g_start, g_size in iter_children(
+                    data, child_start, child_start + child_size
+                ):
+                    value = data[g_start : g_start + g_size]
+                    if grandchild == BLOCK:
+                        self._add_block(
+                            value, bytes_per_track, block_timestamps
+                        )
+                        last_duration = None
+                    elif grandchild == BLOCK_DURATION:
+                        last_duration = read_uint(value)
+        block_timestamps = [timestamp + t for t in block_timestamps]
+        sample = ClusterSample(
+            timestamp, None, bytes_per_track, block_timestamps, last_duration
+        )
+        return sample, start + size
+
+    @staticmethod
+    def _add_block(
+        block: bytes,
+        bytes_per_track: typing.Dict[int, int],
+        block_timestamps: typing.List[int],
+    ) -> None:
+        track, payload = read_vint(block, 0)
+        (relative,) = struct.unpack_from(">h", block, payload)
+        frames = len(block) - payload - 3
+        bytes_per_track[track] = bytes_per_track.get(track, 0) + frames
+        block_timestamps.append(relative)
+
+    def cluster_timestamp(self, offset: int) -> typing.Optional[int]:
+        if offset >= self.segment_end:
+            return None
+        element_id, _, start = self.header_at(offset)
+        if element_id != CLUSTER:
+            return None
+        data = self.pread(start, 2 * HEADER_PROBE)
+        child, size, child_start = read_header(data, 0)
+        if child != TIMESTAMP:
+            return None
+        return read_uint(data[child_start : child_start + size])
+
+    def sample_cluster(self, offset: int) -> ClusterSample:
+        sample, end = self.read_cluster(offset)
+        following = self.cluster_timestamp(end)
+        if following is not None:
+            sample.duration = following - sample.timestamp
+        return sample
+
+    def last_cluster(self) -> typing.Optional[ClusterSample]:
+        if not self.cues:
+            return None
+        offset = self.cues[-1][1]
+        last = offset
+        while offset < self.segment_end:
+            element_id, size, start = self.header_at(offset)
+            if size == UNKNOWN_SIZE:
+                break
+            if element_id == CLUSTER:
+                last = offset
+            offset = start + size
+        return self.read_cluster(last)[0]
+
+
+def _estimate(
+    rates: typing.Sequence[float],
+) -> media_library.BitrateEstimate:
+    mean = statistics.fmean(rates)
+    if len(rates) < 2:
+        return media_library.BitrateEstimate(mean, mean, mean, len(rates))
+    error = Z_95 * statistics.stdev(rates) / math.sqrt(len(rates))
+    return media_library.BitrateEstimate(
+        mean, max(0.0, mean - error), mean + error, len(rates)
+    )
+
+
+def _spread(count: int, samples: int) -> typing.List[int]:
+    if count <= samples:
+        return list(range(count))
+    step = (count - 1) / (samples - 1)
+    return sorted({round(i * step) for i in range(samples)})
+
+
+def probe(
+    path: typing.Union[str, os.PathLike], samples: int = 16
+) -> ProbeResult:
+    with MatroskaFile(path) as mkv:
+        scale = mkv.timestamp_scale / 1e9
+        rates: typing.Dict[int, typing.List[float]] = {
+            track.number: [] for track in mkv.tracks
+        }
+        sampled = 0
+        gaps = []
+        for index in _spread(len(mkv.cues), max(samples, 2)):
+            sample = mkv.sample_cluster(mkv.cues[index][1])
+            if not sample.duration:
+                continue
+            sampled += 1
+            seconds = sample.duration * scale
+            for number, found in rates.items():
+                size = sample.bytes_per_track.get(number, 0)
+                found.append(size * 8 / seconds)
+            stamps = sorted(set(sample.block_timestamps))
+            gaps.extend(b - a for a, b in zip(stamps, stamps[1:]))
+
+        duration = duration_error = None
+        last = mkv.last_cluster()
+        if last is not None and last.block_timestamps:
+            frame = last.last_block_duration or (
+                statistics.median(gaps) if gaps else 0
+            )
+            end = max(last.block_timestamps) + frame
+            duration = datetime.timedelta(seconds=end * scale)
+            duration_error = datetime.timedelta(seconds=frame * scale)
+
+        declared = None
+        if mkv.declared_duration is not None:
+            declared = datetime.timedelta(
+                seconds=mkv.declared_duration * scale
+            )
+        return ProbeResult(
+            tracks=list(mkv.tracks),
+            bitrates={
+                number: _estimate(found)
+                for number, found in rates.items()
+                if found
+            },
+            duration=duration,
+            duration_error=duration_error,
+            declared_duration=declared,
+            clusters_sampled=sampled,
+            bytes_read=mkv.bytes_read,
+        )
+
+
+def attach_bitrates(
+    streams: media_library.StreamDetails, result: ProbeResult
+) -> media_library.StreamDetails:
+    video_tracks = [t for t in result.tracks if t.kind == "video"]
+    audio_tracks = [t for t in result.tracks if t.kind == "audio"]
+    return media_library.StreamDetails(
+        videos=tuple(
+            dataclasses.replace(
+                stream, bitrate=result.bitrates.get(track.number)
+            )
+            for stream, track in zip(streams.videos, video_tracks)
+        )
+        + streams.videos[len(video_tracks) :],
+        audios=tuple(
+            dataclasses.replace(
+                stream, bitrate=result.bitrates.get(track.number)
+            )
+            for stream, track in zip(streams.audios, audio_tracks)
+        )
+        + streams.audios[len(audio_tracks) :],
+        subs=streams.subs,
+    )
@@ -52,11 +52,22 @@ class StreamDetails:
     subs: typing.Tuple[SubStream, ...] = ()
 
 
+@dataclasses.dataclass(frozen=True)
+class BitrateEstimate:
+    bits_per_second: float
+    low: float
+    high: float
+    samples: int
+
+
 @dataclasses.dataclass
 class VideoStream:
     codec: typing.Optional[str] = None
     width: typing.Optional[int] = None
     height: typing.Optional[int] = None
+    bitrate: typing.Optional[BitrateEstimate] = dataclasses.field(
+        default=None, compare=False
+    )
 
 
 @dataclasses.dataclass
@@ -64,6 +75,9 @@ class AudioStream:
     codec: typing.Optional[str] = None
     language: typing.Optional[str] = None
     channels: typing.Optional[int] = None
+    bitrate: typing.Optional[BitrateEstimate] = dataclasses.field(
+        default=None, compare=False
+    )
 
 
 @dataclasses.dataclass
@@ -79,6 +93,10 @@ class Movie:
     streams: StreamDetails = dataclasses.field(
         default_factory=lambda: StreamDetails()
     )
+    path: typing.Optional[str] = dataclasses.field(default=None, compare=False)
+    filename_and_path: typing.Optional[str] = dataclasses.field(
+        default=None, compare=False
+    )
 
     @property
     def video_streams(self) -> typing.Iterator[VideoStream]:
@@ -120,6 +138,10 @@ class Episode:
     streams: StreamDetails = dataclasses.field(
         default_factory=lambda: StreamDetails()
     )
+    path: typing.Optional[str] = dataclasses.field(default=None, compare=False)
+    filename_and_path: typing.Optional[str] = dataclasses.field(
+        default=None, compare=False
+    )
 
     @property
     def video_streams(self) -> typing.Iterator[VideoStream]:
@@ -0,0 +1,166 @@
+# %%
+
+from __future__ import annotations
+
+
+import concurrent.futures
+import dataclasses
+import os
+import re
+import typing
+import unicodedata
+from . import library_xml
+from . import media_library
+
+Entry: typing.TypeAlias = typing.Union[
+    media_library.Movie, media_library.Episode
+]
+Key: typing.TypeAlias = typing.Tuple[typing.Any, ...]
+
+
+@dataclasses.dataclass
+class Copy:
+    entry: Entry
+    source: int = 0
+    mtime: float = 0.0
+
+
+Policy: typing.TypeAlias = typing.Callable[[Copy], typing.Any]
+
+
+def normalize_title(title: typing.Optional[str]) -> str:
+    if not title:
+        return ""
+    text = unicodedata.normalize("NFKD", title)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[\W_]+", " ", text.casefold()).split())
+
+
+def movie_key(movie: media_library.Movie) -> Key:
+    return (normalize_title(movie.title), movie.year)
+
+
+def episode_key(
+    show: typing.Optional[str], episode: media_library.Episode
+) -> Key:
+    if episode.season is None or episode.episode is None:
+        return (normalize_title(show), None, normalize_title(episode.title))
+    return (normalize_title(show), episode.season, episode.episode)
+
+
+def best_resolution(copy: Copy) -> int:
+    return max(
+        ((v.width or 0) * (v.height or 0) for v in copy.entry.video_streams),
+        default=0,
+    )
+
+
+def most_audio_tracks(copy: Copy) -> int:
+    return len(copy.entry.streams.audios)
+
+
+def newest(copy: Copy) -> typing.Tuple[float, int]:
+    return (copy.mtime, copy.source)
+
+
+POLICIES: typing.Dict[str, Policy] = {
+    "best_resolution": best_resolution,
+    "most_audio_tracks": most_audio_tracks,
+    "newest": newest,
+}
+
+
+def _policy_key(
+    policies: typing.Sequence[typing.Union[str, Policy]]
+) -> Policy:
+    funcs = [POLICIES[p] if isinstance(p, str) else p for p in policies]
+    return lambda copy: tuple(func(copy) for func in funcs)
+
+
+@dataclasses.dataclass
+class MergedLibrary:
+    database: media_library.VideoDatabase
+    movie_copies: typing.Dict[Key, typing.List[Copy]]
+    episode_copies: typing.Dict[Key, typing.List[Copy]]
+
+    @property
+    def duplicates(
+        self,
+    ) -> typing.Iterator[typing.Tuple[Key, typing.List[Copy]]]:
+        for copies in (self.movie_copies, self.episode_copies):
+            for key, found in copies.items():
+                if len(found) > 1:
+                    yield key, found
+
+
+def merge_databases(
+    databases: typing.Sequence[media_library.VideoDatabase],
+    policies: typing.Sequence[typing.Union[str, Policy]] = (
+        "best_resolution",
+    ),
+    mtimes: typing.Optional[typing.Sequence[float]] = None,
+) -> MergedLibrary:
+    if mtimes is None:
+        mtimes = [0.0] * len(databases)
+    movie_copies: typing.Dict[Key, typing.List[Copy]] = {}
+    episode_copies: typing.Dict[Key, typing.List[Copy]] = {}
+    shows: typing.Dict[str, media_library.Series] = {}
+    show_episodes: typing.Dict[str, typing.List[Key]] = {}
+
+    for source, (database, mtime) in enumerate(zip(databases, mtimes)):
+        for movie in database.movies:
+            movie_copies.setdefault(movie_key(movie), []).append(
+                Copy(entry=movie, source=source, mtime=mtime)
+            )
+        for series in database.series:
+            show = normalize_title(series.title)
+            if show not in shows:
+                shows[show] = dataclasses.replace(series, episodes=[])
+                show_episodes[show] = []
+            for episode in series.episodes:
+                key = episode_key(series.title, episode)
+                if key not in episode_copies:
+                    episode_copies[key] = []
+                    show_episodes[show].append(key)
+                episode_copies[key].append(
+                    Copy(entry=episode, source=source, mtime=mtime)
+                )
+
+    sort_key = _policy_key(policies)
+    movies = [
+        typing.cast(media_library.Movie, max(found, key=sort_key).entry)
+        for found in movie_copies.values()
+    ]
+    for show, series in shows.items():
+        series.episodes = [
+            typing.cast(
+                media_library.Episode,
+                max(episode_copies[key], key=sort_key).entry,
+            )
+            for key in show_episodes[show]
+        ]
+    return MergedLibrary(
+        database=media_library.VideoDatabase(
+            movies=movies, series=list(shows.values())
+        ),
+        movie_copies=movie_copies,
+        episode_copies=episode_copies,
+    )
+
+
+def parse_exports(
+    paths: typing.Sequence[typing.Union[str, os.PathLike]],
+    policies: typing.Sequence[typing.Union[str, Policy]] = (
+        "best_resolution",
+    ),
+    jobs: typing.Optional[int] = None,
+) -> MergedLibrary:
+    mtimes = [os.stat(path).st_mtime for path in paths]
+    if jobs == 1 or len(paths) < 2:
+        databases = [library_xml.XML_Parser.parse_file(p) for p in paths]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+            databases = list(
+                executor.map(library_xml.XML_Parser.parse_file, paths)
+            )
+    return merge_databases(databases, policies=policies, mtimes=mtimes)
@@ -0,0 +1,313 @@
+# %%
+
+from __future__ import annotations
+
+
+import datetime
+import os
+import typing
+from . import media_library
+from . import records
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+Entry: typing.TypeAlias = typing.Union[
+    media_library.Movie, media_library.Episode
+]
+Source: typing.TypeAlias = records.Source
+
+KINDS = ("movie", "episode")
+STREAM_KINDS = ("video", "audio", "subtitle")
+
+
+def _require_pyarrow() -> None:
+    if pyarrow is None:
+        raise ImportError(
+            "the parquet exporter requires the 'pyarrow' package"
+        )
+
+
+def entry_schema() -> pyarrow.Schema:
+    _require_pyarrow()
+    return pyarrow.schema(
+        [
+            ("entry_id", pyarrow.int64()),
+            ("show", pyarrow.string()),
+            ("title", pyarrow.string()),
+            ("year", pyarrow.int32()),
+            ("season", pyarrow.int32()),
+            ("episode", pyarrow.int32()),
+            ("duration_seconds", pyarrow.int64()),
+            ("path", pyarrow.string()),
+            ("filename_and_path", pyarrow.string()),
+        ]
+    )
+
+
+def stream_schema() -> pyarrow.Schema:
+    _require_pyarrow()
+    return pyarrow.schema(
+        [
+            ("entry_id", pyarrow.int64()),
+            ("stream_kind", pyarrow.string()),
+            ("position", pyarrow.int32()),
+            ("codec", pyarrow.string()),
+            ("language", pyarrow.string()),
+            ("width", pyarrow.int32()),
+            ("height", pyarrow.int32()),
+            ("channels", pyarrow.int32()),
+            ("bitrate", pyarrow.float64()),
+            ("bitrate_low", pyarrow.float64()),
+            ("bitrate_high", pyarrow.float64()),
+            ("bitrate_samples", pyarrow.int32()),
+        ]
+    )
+
+
+def iter_entries(
+    source: Source,
+) -> typing.Iterator[typing.Tuple[typing.Optional[str], Entry]]:
+    yield from records.iter_entries(source)
+
+
+class _PartitionWriter:
+    def __init__(
+        self, path: str, schema: pyarrow.Schema, batch_size: int
+    ) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._schema = schema
+        self._writer = pyarrow.parquet.ParquetWriter(path, schema)
+        self._batch_size = batch_size
+        self._columns: typing.Dict[str, typing.List] = {
+            name: [] for name in schema.names
+        }
+        self._rows = 0
+
+    def append(self, **row: typing.Any) -> None:
+        for name, column in self._columns.items():
+            column.append(row.get(name))
+        self._rows += 1
+        if self._rows >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        self._writer.write_table(
+            pyarrow.Table.from_pydict(self._columns, schema=self._schema)
+        )
+        for column in self._columns.values():
+            column.clear()
+        self._rows = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.close()
+
+
+def _stream_rows(
+    entry: Entry,
+) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    groups = (
+        ("video", entry.streams.videos),
+        ("audio", entry.streams.audios),
+        ("subtitle", entry.streams.subs),
+    )
+    for kind, streams in groups:
+        for position, stream in enumerate(streams):
+            row: typing.Dict[str, typing.Any] = {
+                "stream_kind": kind,
+                "position": position,
+                "language": getattr(stream, "language", None),
+            }
+            if isinstance(stream, media_library.VideoStream):
+                row.update(
+                    codec=stream.codec,
+                    width=stream.width,
+                    height=stream.height,
+                )
+            elif isinstance(stream, media_library.AudioStream):
+                row.update(codec=stream.codec, channels=stream.channels)
+            bitrate = getattr(stream, "bitrate", None)
+            if bitrate is not None:
+                row.update(
+                    bitrate=bitrate.bits_per_second,
+                    bitrate_low=bitrate.low,
+                    bitrate_high=bitrate.high,
+                    bitrate_samples=bitrate.samples,
+                )
+            yield row
+
+
+def write_dataset(
+    source: Source,
+    root: typing.Union[str, os.PathLike],
+    batch_size: int = 65536,
+) -> typing.Dict[str, int]:
+    _require_pyarrow()
+    root = os.fspath(root)
+    writers = {}
+    for kind in KINDS:
+        writers["entries", kind] = _PartitionWriter(
+            os.path.join(root, "entries", f"kind={kind}", "part-0.parquet"),
+            entry_schema(),
+            batch_size,
+        )
+        writers["streams", kind] = _PartitionWriter(
+            os.path.join(root, "streams", f"kind={kind}", "part-0.parquet"),
+            stream_schema(),
+            batch_size,
+        )
+    counts = dict.fromkeys(KINDS, 0)
+    try:
+        for entry_id, (show, entry) in enumerate(iter_entries(source)):
+            is_movie = isinstance(entry, media_library.Movie)
+            kind = "movie" if is_movie else "episode"
+            counts[kind] += 1
+            writers["entries", kind].append(
+                entry_id=entry_id,
+                show=show,
+                title=entry.title,
+                year=entry.year,
+                season=None if is_movie else entry.season,
+                episode=None if is_movie else entry.episode,
+                duration_seconds=(
+                    None
+                    if entry.duration is None
+                    else int(entry.duration.total_seconds())
+                ),
+                path=entry.path,
+                filename_and_path=entry.filename_and_path,
+            )
+            for row in _stream_rows(entry):
+                writers["streams", kind].append(entry_id=entry_id, **row)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return counts
+
+
+def _iter_rows(
+    path: str, batch_size: int
+) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    if not os.path.exists(path):
+        return
+    for batch in pyarrow.parquet.ParquetFile(path).iter_batches(
+        batch_size=batch_size
+    ):
+        yield from batch.to_pylist()
+
+
+def _bitrate(
+    row: typing.Dict[str, typing.Any]
+) -> typing.Optional[media_library.BitrateEstimate]:
+    if row["bitrate"] is None:
+        return None
+    return media_library.BitrateEstimate(
+        row["bitrate"],
+        row["bitrate_low"],
+        row["bitrate_high"],
+        row["bitrate_samples"],
+    )
+
+
+def _streams(
+    rows: typing.List[typing.Dict[str, typing.Any]]
+) -> media_library.StreamDetails:
+    ordered = sorted(
+        rows,
+        key=lambda r: (STREAM_KINDS.index(r["stream_kind"]), r["position"]),
+    )
+    return media_library.StreamDetails(
+        videos=tuple(
+            media_library.VideoStream(
+                codec=r["codec"],
+                width=r["width"],
+                height=r["height"],
+                bitrate=_bitrate(r),
+            )
+            for r in ordered
+            if r["stream_kind"] == "video"
+        ),
+        audios=tuple(
+            media_library.AudioStream(
+                codec=r["codec"],
+                language=r["language"],
+                channels=r["channels"],
+                bitrate=_bitrate(r),
+            )
+            for r in ordered
+            if r["stream_kind"] == "audio"
+        ),
+        subs=tuple(
+            media_library.SubStream(language=r["language"])
+            for r in ordered
+            if r["stream_kind"] == "subtitle"
+        ),
+    )
+
+
+def read_entries(
+    root: typing.Union[str, os.PathLike],
+    kinds: typing.Sequence[str] = KINDS,
+    batch_size: int = 65536,
+) -> typing.Iterator[typing.Tuple[typing.Optional[str], Entry]]:
+    _require_pyarrow()
+    root = os.fspath(root)
+    for kind in kinds:
+        entries = _iter_rows(
+            os.path.join(root, "entries", f"kind={kind}", "part-0.parquet"),
+            batch_size,
+        )
+        streams = _iter_rows(
+            os.path.join(root, "streams", f"kind={kind}", "part-0.parquet"),
+            batch_size,
+        )
+        pending = next(streams, None)
+        for row in entries:
+            found = []
+            entry_id = row["entry_id"]
+            while pending is not None and pending["entry_id"] <= entry_id:
+                if pending["entry_id"] == entry_id:
+                    found.append(pending)
+                pending = next(streams, None)
+            duration = (
+                None
+                if row["duration_seconds"] is None
+                else datetime.timedelta(seconds=row["duration_seconds"])
+            )
+            common = dict(
+                title=row["title"],
+                year=row["year"],
+                duration=duration,
+                streams=_streams(found),
+                path=row["path"],
+                filename_and_path=row["filename_and_path"],
+            )
+            if kind == "movie":
+                yield None, media_library.Movie(**common)
+            else:
+                yield row["show"], media_library.Episode(
+                    season=row["season"], episode=row["episode"], **common
+                )
+
+
+def read_database(
+    root: typing.Union[str, os.PathLike], batch_size: int = 65536
+) -> media_library.VideoDatabase:
+    database = media_library.VideoDatabase(movies=[], series=[])
+    shows: typing.Dict[typing.Optional[str], media_library.Series] = {}
+    for show, entry in read_entries(root, batch_size=batch_size):
+        if isinstance(entry, media_library.Movie):
+            database.movies.append(entry)
+            continue
+        series = shows.get(show)
+        if series is None:
+            series = shows[show] = media_library.Series(title=show)
+            database.series.append(series)
+        series.episodes.append(entry)
+    return database
@@ -0,0 +1,212 @@
+# %%
+
+from __future__ import annotations
+
+
+import bisect
+import collections
+import dataclasses
+import typing
+from . import media_library
+
+Entry: typing.TypeAlias = typing.Union[
+    media_library.Movie, media_library.Episode
+]
+Predicate: typing.TypeAlias = typing.Callable[[Entry], bool]
+
+SCOPES = ("movie", "episode")
+
+
+@dataclasses.dataclass(frozen=True)
+class Rule:
+    name: str
+    check: str
+    value: typing.Any = None
+    scope: str = "any"
+
+    def applies_to(self, scope: str) -> bool:
+        return self.scope in ("any", scope)
+
+
+def require_audio_language(
+    name: str, language: str, scope: str = "any"
+) -> Rule:
+    return Rule(name, "audio_language", language.lower(), scope)
+
+
+def require_sub_language(name: str, language: str, scope: str = "any") -> Rule:
+    return Rule(name, "sub_language", language.lower(), scope)
+
+
+def min_video_height(name: str, height: int, scope: str = "any") -> Rule:
+    return Rule(name, "min_height", height, scope)
+
+
+def min_video_width(name: str, width: int, scope: str = "any") -> Rule:
+    return Rule(name, "min_width", width, scope)
+
+
+def forbid_video_codec(name: str, codec: str, scope: str = "any") -> Rule:
+    return Rule(name, "forbid_video_codec", codec.lower(), scope)
+
+
+def season_shares_audio_layout(name: str) -> Rule:
+    return Rule(name, "season_audio_layout", scope="episode")
+
+
+def predicate(name: str, func: Predicate, scope: str = "any") -> Rule:
+    return Rule(name, "predicate", func, scope)
+
+
+def _lower(values: typing.Iterable[typing.Optional[str]]) -> typing.Set[str]:
+    return {value.lower() for value in values if value}
+
+
+def audio_layout(entry: Entry) -> typing.Tuple:
+    return tuple(
+        sorted(
+            (audio.codec or "", audio.channels or 0, audio.language or "")
+            for audio in entry.audio_streams
+        )
+    )
+
+
+class _Thresholds:
+    def __init__(self, rules: typing.Iterable[Rule]) -> None:
+        ordered = sorted((rule.value, rule.name) for rule in rules)
+        self.values = [value for value, _ in ordered]
+        self.names = [name for _, name in ordered]
+
+    def violated(self, lowest: typing.Optional[int]) -> typing.List[str]:
+        if lowest is None or not self.names:
+            return []
+        return self.names[bisect.bisect_right(self.values, lowest) :]
+
+
+class _Plan:
+    def __init__(self, rules: typing.Sequence[Rule]) -> None:
+        self.audio: typing.Dict[str, typing.List[str]] = {}
+        self.subs: typing.Dict[str, typing.List[str]] = {}
+        self.codecs: typing.Dict[str, typing.List[str]] = {}
+        self.predicates: typing.List[typing.Tuple[str, Predicate]] = []
+        self.season_layout: typing.List[str] = []
+        by_check = collections.defaultdict(list)
+        for rule in rules:
+            by_check[rule.check].append(rule)
+        for rule in by_check["audio_language"]:
+            self.audio.setdefault(rule.value, []).append(rule.name)
+        for rule in by_check["sub_language"]:
+            self.subs.setdefault(rule.value, []).append(rule.name)
+        for rule in by_check["forbid_video_codec"]:
+            self.codecs.setdefault(rule.value, []).append(rule.name)
+        for rule in by_check["predicate"]:
+            self.predicates.append((rule.name, rule.value))
+        self.season_layout = [r.name for r in by_check["season_audio_layout"]]
+        self.heights = _Thresholds(by_check["min_height"])
+        self.widths = _Thresholds(by_check["min_width"])
+        self.required_audio = frozenset(self.audio)
+        self.required_subs = frozenset(self.subs)
+        self.forbidden_codecs = frozenset(self.codecs)
+
+    def check(self, entry: Entry) -> typing.List[str]:
+        violated: typing.List[str] = []
+        streams = entry.streams
+        if self.required_audio:
+            found = _lower(audio.language for audio in streams.audios)
+            for language in self.required_audio - found:
+                violated.extend(self.audio[language])
+        if self.required_subs:
+            found = _lower(sub.language for sub in streams.subs)
+            for language in self.required_subs - found:
+                violated.extend(self.subs[language])
+        if self.forbidden_codecs:
+            found = _lower(video.codec for video in streams.videos)
+            for codec in self.forbidden_codecs & found:
+                violated.extend(self.codecs[codec])
+        heights = [v.height for v in streams.videos if v.height is not None]
+        violated.extend(self.heights.violated(min(heights, default=None)))
+        widths = [v.width for v in streams.videos if v.width is not None]
+        violated.extend(self.widths.violated(min(widths, default=None)))
+        for name, func in self.predicates:
+            if not func(entry):
+                violated.append(name)
+        return violated
+
+
+@dataclasses.dataclass
+class EntryViolations:
+    entry: Entry
+    series: typing.Optional[media_library.Series]
+    rules: typing.List[str]
+
+
+@dataclasses.dataclass
+class PolicyReport:
+    violations: typing.List[EntryViolations]
+    counts: typing.Dict[str, int]
+    unmatched: typing.List[str]
+
+
+class PolicyEngine:
+    def __init__(self, rules: typing.Sequence[Rule]) -> None:
+        names = [rule.name for rule in rules]
+        if len(set(names)) != len(names):
+            raise ValueError("rule names must be unique")
+        self.rules = list(rules)
+        self._plans = {
+            scope: _Plan([r for r in rules if r.applies_to(scope)])
+            for scope in SCOPES
+        }
+        self.runs = 0
+        self.last_matched: typing.Dict[str, typing.Optional[int]] = {
+            name: None for name in names
+        }
+
+    def evaluate(
+        self, database: media_library.VideoDatabase
+    ) -> PolicyReport:
+        found: typing.Dict[int, EntryViolations] = {}
+        movie_plan = self._plans["movie"]
+        for movie in database.movies:
+            rules = movie_plan.check(movie)
+            if rules:
+                found[id(movie)] = EntryViolations(movie, None, rules)
+
+        episode_plan = self._plans["episode"]
+        layout_rules = episode_plan.season_layout
+        for series in database.series:
+            seasons: typing.Dict[typing.Any, typing.List] = {}
+            for episode in series.episodes:
+                rules = episode_plan.check(episode)
+                if rules:
+                    found[id(episode)] = EntryViolations(
+                        episode, series, rules
+                    )
+                if layout_rules:
+                    seasons.setdefault(episode.season, []).append(
+                        (audio_layout(episode), episode)
+                    )
+            for episodes in seasons.values():
+                layouts = collections.Counter(layout for layout, _ in episodes)
+                if len(layouts) < 2:
+                    continue
+                common = layouts.most_common(1)[0][0]
+                for layout, episode in episodes:
+                    if layout == common:
+                        continue
+                    violation = found.setdefault(
+                        id(episode), EntryViolations(episode, series, [])
+                    )
+                    violation.rules.extend(layout_rules)
+
+        self.runs += 1
+        counts = collections.Counter(
+            name for violation in found.values() for name in violation.rules
+        )
+        for name in counts:
+            self.last_matched[name] = self.runs
+        return PolicyReport(
+            violations=list(found.values()),
+            counts={rule.name: counts[rule.name] for rule in self.rules},
+            unmatched=[r.name for r in self.rules if not counts[r.name]],
+        )
@@ -0,0 +1,178 @@
+# %%
+
+from __future__ import annotations
+
+
+import concurrent.futures
+import dataclasses
+import ntpath
+import os
+import posixpath
+import typing
+from . import library_dir
+from . import media_library
+from . import records
+
+Entry: typing.TypeAlias = typing.Union[
+    media_library.Movie, media_library.Episode
+]
+Listing: typing.TypeAlias = typing.Dict[str, os.DirEntry]
+
+
+def _is_windows_path(path: str) -> bool:
+    return "\\" in path or ntpath.splitdrive(path)[0] != ""
+
+
+def _normalize(path: str) -> str:
+    if _is_windows_path(path):
+        return path.replace("\\", "/").lower()
+    return path
+
+
+@dataclasses.dataclass
+class PathMapping:
+    prefixes: typing.Sequence[typing.Tuple[str, str]] = ()
+
+    def __post_init__(self) -> None:
+        self._rules = sorted(
+            ((_normalize(src), dst) for src, dst in self.prefixes),
+            key=lambda rule: len(rule[0]),
+            reverse=True,
+        )
+
+    @classmethod
+    def from_strings(cls, rules: typing.Iterable[str]) -> PathMapping:
+        return cls([tuple(rule.split("=", 1)) for rule in rules])
+
+    def __call__(self, path: typing.Optional[str]) -> typing.Optional[str]:
+        if not path:
+            return None
+        normalized = _normalize(path)
+        for source, target in self._rules:
+            if normalized.startswith(source):
+                rest = path[len(source) :]
+                if _is_windows_path(path):
+                    rest = rest.replace("\\", "/")
+                return posixpath.join(target, rest.lstrip("/"))
+        return path
+
+
+@dataclasses.dataclass
+class FileStatus:
+    entry: Entry
+    path: str
+    size: typing.Optional[int] = None
+
+    @property
+    def exists(self) -> bool:
+        return self.size is not None
+
+
+@dataclasses.dataclass
+class ReconcileReport:
+    present: typing.List[FileStatus] = dataclasses.field(default_factory=list)
+    missing: typing.List[FileStatus] = dataclasses.field(default_factory=list)
+    empty: typing.List[FileStatus] = dataclasses.field(default_factory=list)
+    orphans: typing.List[str] = dataclasses.field(default_factory=list)
+    unmapped: typing.List[Entry] = dataclasses.field(default_factory=list)
+
+
+def _list_directory(directory: str) -> typing.Optional[Listing]:
+    try:
+        with os.scandir(directory) as entries:
+            return {entry.name: entry for entry in entries}
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return None
+
+
+def _size(entry: os.DirEntry) -> typing.Optional[int]:
+    try:
+        return entry.stat().st_size
+    except FileNotFoundError:
+        return None
+
+
+def _stem(name: str) -> str:
+    return os.path.splitext(name)[0].casefold()
+
+
+def reconcile(
+    database: media_library.VideoDatabase,
+    mapping: typing.Optional[
+        typing.Callable[[str], typing.Optional[str]]
+    ] = None,
+    roots: typing.Sequence[typing.Union[str, os.PathLike]] = (),
+    suffixes: typing.Collection[str] = library_dir.MEDIA_SUFFIXES,
+    jobs: int = 16,
+) -> ReconcileReport:
+    mapping = mapping or PathMapping()
+    report = ReconcileReport()
+    expected: typing.Dict[str, typing.List[typing.Tuple[Entry, str]]] = {}
+    for _, entry in records.iter_entries(database):
+        local = mapping(entry.filename_and_path or "")
+        if local is None or _is_windows_path(local):
+            report.unmapped.append(entry)
+            continue
+        directory, name = os.path.split(os.path.normpath(local))
+        expected.setdefault(directory, []).append((entry, name))
+
+    listings: typing.Dict[str, typing.Optional[Listing]] = {}
+    scanned: typing.List[str] = []
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        frontier = [os.path.normpath(os.fspath(root)) for root in roots]
+        while frontier:
+            found = executor.map(_list_directory, frontier)
+            listings.update(zip(frontier, found))
+            scanned.extend(frontier)
+            frontier = [
+                entry.path
+                for directory in frontier
+                for entry in (listings[directory] or {}).values()
+                if entry.is_dir(follow_symlinks=False)
+            ]
+        remaining = [d for d in expected if d not in listings]
+        listings.update(
+            zip(remaining, executor.map(_list_directory, remaining))
+        )
+
+        def check(directory: str) -> typing.List[FileStatus]:
+            listing = listings[directory] or {}
+            folded: typing.Optional[Listing] = None
+            statuses = []
+            for entry, name in expected[directory]:
+                found = listing.get(name)
+                if found is None:
+                    if folded is None:
+                        folded = {n.casefold(): f for n, f in listing.items()}
+                    found = folded.get(name.casefold())
+                size = None if found is None else _size(found)
+                statuses.append(
+                    FileStatus(entry, os.path.join(directory, name), size)
+                )
+            return statuses
+
+        for statuses in executor.map(check, list(expected)):
+            for status in statuses:
+                if not status.exists:
+                    report.missing.append(status)
+                elif status.size == 0:
+                    report.empty.append(status)
+                else:
+                    report.present.append(status)
+
+    claimed = {
+        (os.path.normcase(directory), _stem(name))
+        for directory, found in expected.items()
+        for _, name in found
+    }
+    suffixes = {suffix.lower() for suffix in suffixes}
+    for directory in dict.fromkeys(scanned):
+        for name, found in (listings[directory] or {}).items():
+            if (
+                os.path.splitext(name)[1].lower() in suffixes
+                and (os.path.normcase(directory), _stem(name)) not in claimed
+                and found.is_file()
+            ):
+                report.orphans.append(found.path)
+    report.orphans.sort()
+    return report
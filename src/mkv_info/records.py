@@ -0,0 +1,86 @@
+# %%
+
+from __future__ import annotations
+
+
+import typing
+from . import media_library
+
+Record: typing.TypeAlias = typing.Dict[str, typing.Any]
+Entry: typing.TypeAlias = typing.Union[
+    media_library.Movie, media_library.Episode
+]
+Source: typing.TypeAlias = typing.Union[
+    media_library.VideoDatabase,
+    typing.Iterable[typing.Union[media_library.Movie, media_library.Series]],
+]
+
+FIELDS: typing.Tuple[str, ...] = (
+    "kind",
+    "show",
+    "title",
+    "year",
+    "season",
+    "episode",
+    "duration",
+    "video_codecs",
+    "width",
+    "height",
+    "audio_codecs",
+    "audio_languages",
+    "audio_channels",
+    "sub_languages",
+    "path",
+)
+
+
+def iter_entries(
+    source: Source,
+) -> typing.Iterator[typing.Tuple[typing.Optional[str], Entry]]:
+    if isinstance(source, media_library.VideoDatabase):
+        source = [*source.movies, *source.series]
+    for item in source:
+        if isinstance(item, media_library.Series):
+            for episode in item.episodes:
+                yield item.title, episode
+        else:
+            yield None, item
+
+
+def entry_record(
+    entry: Entry,
+    show: typing.Optional[str] = None,
+) -> Record:
+    videos = entry.streams.videos
+    audios = entry.streams.audios
+    is_movie = isinstance(entry, media_library.Movie)
+    return {
+        "kind": "movie" if is_movie else "episode",
+        "show": show,
+        "title": entry.title,
+        "year": entry.year,
+        "season": None if is_movie else entry.season,
+        "episode": None if is_movie else entry.episode,
+        "duration": (
+            None
+            if entry.duration is None
+            else int(entry.duration.total_seconds())
+        ),
+        "video_codecs": [v.codec for v in videos],
+        "width": max(
+            (v.width for v in videos if v.width is not None), default=None
+        ),
+        "height": max(
+            (v.height for v in videos if v.height is not None), default=None
+        ),
+        "audio_codecs": [a.codec for a in audios],
+        "audio_languages": [a.language for a in audios],
+        "audio_channels": [a.channels for a in audios],
+        "sub_languages": [s.language for s in entry.streams.subs],
+        "path": entry.filename_and_path,
+    }
+
+
+def iter_records(source: Source) -> typing.Iterator[Record]:
+    for show, entry in iter_entries(source):
+        yield entry_record(entry, show=show)
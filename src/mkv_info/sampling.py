@@ -0,0 +1,184 @@
+# %%
+
+from __future__ import annotations
+
+
+import dataclasses
+import math
+import mmap
+import os
+import random
+import re
+import statistics
+import typing
+import xml.etree.ElementTree as ET
+from . import compressed
+from . import library_xml
+from . import media_library
+
+Entry: typing.TypeAlias = typing.Union[
+    media_library.Movie, media_library.Episode
+]
+
+START_PATTERN = re.compile(rb"<(movie|episodedetails)>")
+
+
+@dataclasses.dataclass(frozen=True)
+class Estimate:
+    value: float
+    low: float
+    high: float
+    n: int
+
+
+def _z(confidence: float) -> float:
+    return statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+def sample_size(
+    margin: float, proportion: float = 0.5, confidence: float = 0.95
+) -> int:
+    if not 0 < margin < 1:
+        raise ValueError("margin must be between 0 and 1")
+    z = _z(confidence)
+    return math.ceil(z * z * proportion * (1 - proportion) / margin**2)
+
+
+def _weighted_quantile(
+    pairs: typing.Sequence[typing.Tuple[float, float]], q: float
+) -> float:
+    total = sum(weight for _, weight in pairs)
+    target = min(max(q, 0.0), 1.0) * total
+    running = 0.0
+    for value, weight in pairs:
+        running += weight
+        if running >= target:
+            return value
+    return pairs[-1][0]
+
+
+@dataclasses.dataclass
+class Sample:
+    entries: typing.List[Entry]
+    weights: typing.List[float]
+
+    def _values(
+        self, func: typing.Callable[[Entry], typing.Any]
+    ) -> typing.List[typing.Tuple[float, float]]:
+        found = []
+        for entry, weight in zip(self.entries, self.weights):
+            value = func(entry)
+            if value is not None:
+                found.append((float(value), weight))
+        if not found:
+            raise ValueError("no sampled entry produced a value")
+        return found
+
+    def mean(
+        self,
+        func: typing.Callable[[Entry], typing.Optional[float]],
+        confidence: float = 0.95,
+    ) -> Estimate:
+        pairs = self._values(func)
+        total = sum(weight for _, weight in pairs)
+        mean = sum(value * weight for value, weight in pairs) / total
+        n = len(pairs)
+        variance = sum(
+            (weight * (value - mean)) ** 2 for value, weight in pairs
+        ) / (total * total)
+        if n > 1:
+            variance *= n / (n - 1)
+        error = _z(confidence) * math.sqrt(variance)
+        return Estimate(mean, mean - error, mean + error, n)
+
+    def proportion(
+        self,
+        predicate: typing.Callable[[Entry], typing.Optional[bool]],
+        confidence: float = 0.95,
+    ) -> Estimate:
+        estimate = self.mean(predicate, confidence)
+        return dataclasses.replace(
+            estimate,
+            low=max(0.0, estimate.low),
+            high=min(1.0, estimate.high),
+        )
+
+    def quantile(
+        self,
+        func: typing.Callable[[Entry], typing.Optional[float]],
+        q: float,
+        confidence: float = 0.95,
+    ) -> Estimate:
+        pairs = sorted(self._values(func))
+        value = _weighted_quantile(pairs, q)
+        below = self.mean(
+            lambda entry: (
+                None if func(entry) is None else func(entry) <= value
+            ),
+            confidence,
+        )
+        error = below.high - below.value
+        return Estimate(
+            value,
+            _weighted_quantile(pairs, q - error),
+            _weighted_quantile(pairs, q + error),
+            len(pairs),
+        )
+
+
+def _previous_start(data: mmap.mmap, position: int) -> int:
+    while position > 0:
+        position = data.rfind(b"<", 0, position)
+        if position < 0 or START_PATTERN.match(data, position):
+            return position
+    return -1
+
+
+def _parse_block(data: mmap.mmap, start: int, tag: bytes) -> Entry:
+    closing = b"</" + tag + b">"
+    end = data.find(closing, start)
+    if end < 0:
+        raise ValueError(f"unterminated <{tag.decode()}> at byte {start}")
+    element = ET.fromstring(data[start : end + len(closing)])
+    if tag == b"movie":
+        return library_xml.XML_Parser.parse_movie(element)
+    return library_xml.XML_Parser.parse_episode(element)
+
+
+def sample_entries(
+    path: typing.Union[str, os.PathLike],
+    n: int,
+    seed: typing.Optional[int] = None,
+) -> Sample:
+    rng = random.Random(seed)
+    entries: typing.List[Entry] = []
+    weights: typing.List[float] = []
+    with open(path, "rb") as stream:
+        if compressed.detect_codec(stream) is not None:
+            raise ValueError("sampling requires an uncompressed export")
+        size = os.fstat(stream.fileno()).st_size
+        if size == 0:
+            raise ValueError("export is empty")
+        with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            first = START_PATTERN.search(data)
+            if first is None:
+                raise ValueError("export contains no entries")
+            wrapped = first.start() + size - _previous_start(data, size)
+            parsed: typing.Dict[int, Entry] = {}
+            while len(entries) < n:
+                match = START_PATTERN.search(data, rng.randrange(size))
+                if match is None:
+                    match = first
+                start = match.start()
+                if start == first.start():
+                    gap = wrapped
+                else:
+                    gap = start - _previous_start(data, start)
+                entry = parsed.get(start)
+                if entry is None:
+                    entry = parsed[start] = _parse_block(
+                        data, start, match.group(1)
+                    )
+                entries.append(entry)
+                weights.append(1 / gap)
+    return Sample(entries, weights)
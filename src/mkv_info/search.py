@@ -0,0 +1,164 @@
+# %%
+
+from __future__ import annotations
+
+
+import dataclasses
+import heapq
+import math
+import os
+import pickle
+import typing
+from . import media_library
+from . import merge
+
+FORMAT_VERSION = 1
+
+
+@dataclasses.dataclass(frozen=True)
+class Document:
+    kind: str
+    title: typing.Optional[str]
+    year: typing.Optional[int] = None
+    show: typing.Optional[str] = None
+    season: typing.Optional[int] = None
+    episode: typing.Optional[int] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class Match:
+    document: Document
+    score: float
+
+
+def ngrams(text: typing.Optional[str], n: int = 3) -> typing.FrozenSet[str]:
+    normalized = merge.normalize_title(text)
+    if not normalized:
+        return frozenset()
+    padded = " " * (n - 1) + normalized + " "
+    return frozenset(padded[i : i + n] for i in range(len(padded) - n + 1))
+
+
+class TitleIndex:
+    def __init__(self, n: int = 3) -> None:
+        self.n = n
+        self._documents: typing.Dict[int, Document] = {}
+        self._grams: typing.Dict[int, typing.FrozenSet[str]] = {}
+        self._ids: typing.Dict[Document, int] = {}
+        self._postings: typing.Dict[str, typing.Set[int]] = {}
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, document: Document) -> bool:
+        return document in self._ids
+
+    def add(self, document: Document) -> None:
+        if document in self._ids:
+            return
+        doc_id = self._next_id
+        self._next_id += 1
+        grams = ngrams(document.title, self.n)
+        self._documents[doc_id] = document
+        self._grams[doc_id] = grams
+        self._ids[document] = doc_id
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(doc_id)
+
+    def remove(self, document: Document) -> None:
+        doc_id = self._ids.pop(document)
+        del self._documents[doc_id]
+        for gram in self._grams.pop(doc_id):
+            posting = self._postings[gram]
+            posting.discard(doc_id)
+            if not posting:
+                del self._postings[gram]
+
+    def add_database(self, database: media_library.VideoDatabase) -> None:
+        for movie in database.movies:
+            self.add(Document("movie", movie.title, movie.year))
+        for series in database.series:
+            self.add(Document("series", series.title, series.year))
+            for episode in series.episodes:
+                self.add(
+                    Document(
+                        "episode",
+                        episode.title,
+                        episode.year,
+                        show=series.title,
+                        season=episode.season,
+                        episode=episode.episode,
+                    )
+                )
+
+    @classmethod
+    def from_database(
+        cls, database: media_library.VideoDatabase, n: int = 3
+    ) -> TitleIndex:
+        index = cls(n)
+        index.add_database(database)
+        return index
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        min_score: float = 0.3,
+        kinds: typing.Optional[typing.Container[str]] = None,
+    ) -> typing.List[Match]:
+        grams = ngrams(query, self.n)
+        if not grams or min_score <= 0:
+            return []
+        size = len(grams)
+        min_overlap = max(
+            1, math.ceil(min_score * size / (2 - min_score) - 1e-9)
+        )
+        postings = sorted(
+            (self._postings.get(gram, ()) for gram in grams), key=len
+        )
+        candidates: typing.Set[int] = set()
+        for posting in postings[: size - min_overlap + 1]:
+            candidates.update(posting)
+
+        scored = []
+        for doc_id in candidates:
+            document = self._documents[doc_id]
+            if kinds is not None and document.kind not in kinds:
+                continue
+            other = self._grams[doc_id]
+            score = 2 * len(grams & other) / (size + len(other))
+            if score >= min_score:
+                scored.append((score, -doc_id))
+        return [
+            Match(self._documents[-doc_id], score)
+            for score, doc_id in heapq.nlargest(k, scored)
+        ]
+
+    def save(self, path: typing.Union[str, os.PathLike]) -> None:
+        state = (
+            FORMAT_VERSION,
+            self.n,
+            self._next_id,
+            self._documents,
+            self._grams,
+            self._postings,
+        )
+        with open(path, "wb") as stream:
+            pickle.dump(state, stream, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: typing.Union[str, os.PathLike]) -> TitleIndex:
+        with open(path, "rb") as stream:
+            version, n, next_id, documents, grams, postings = pickle.load(
+                stream
+            )
+        if version != FORMAT_VERSION:
+            raise ValueError(f"unsupported index format {version}")
+        index = cls(n)
+        index._next_id = next_id
+        index._documents = documents
+        index._grams = grams
+        index._postings = postings
+        index._ids = {document: i for i, document in documents.items()}
+        return index
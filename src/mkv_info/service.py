@@ -0,0 +1,328 @@
+# %%
+
+from __future__ import annotations
+
+
+import collections
+import dataclasses
+import http.server
+import itertools
+import json
+import os
+import socketserver
+import stat
+import statistics
+import threading
+import time
+import typing
+import urllib.parse
+from . import cube
+from . import media_library
+from . import merge
+from . import records
+from . import search
+
+Params: typing.TypeAlias = typing.Dict[str, typing.List[str]]
+Payload: typing.TypeAlias = typing.Any
+Address: typing.TypeAlias = typing.Union[
+    str, os.PathLike, typing.Tuple[str, int]
+]
+
+FILTERS = ("kind", "codec", "language", "resolution", "show")
+
+
+class ServiceError(ValueError):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _param(params: Params, name: str, default: typing.Any = None) -> str:
+    values = params.get(name)
+    return values[-1] if values else default
+
+
+def _int_param(params: Params, name: str, default: int) -> int:
+    value = _param(params, name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ServiceError(400, f"{name} must be an integer")
+
+
+@dataclasses.dataclass
+class _State:
+    generation: int
+    database: media_library.VideoDatabase
+    index: search.TitleIndex
+    records: typing.List[records.Record]
+    postings: typing.Dict[str, typing.Dict[str, typing.Set[int]]]
+
+
+def _postings(
+    rows: typing.Sequence[records.Record],
+) -> typing.Dict[str, typing.Dict[str, typing.Set[int]]]:
+    postings: typing.Dict[str, typing.Dict[str, typing.Set[int]]] = {
+        name: {} for name in FILTERS
+    }
+    for position, row in enumerate(rows):
+        keys = {
+            "kind": [row["kind"]],
+            "codec": row["video_codecs"],
+            "language": row["audio_languages"],
+            "resolution": [
+                cube.resolution_bucket(row["width"], row["height"])
+            ],
+            "show": [merge.normalize_title(row["show"]) or None],
+        }
+        for name, values in keys.items():
+            for value in values:
+                if value is not None:
+                    postings[name].setdefault(value.lower(), set()).add(
+                        position
+                    )
+    return postings
+
+
+class LibraryService:
+    ROUTES: typing.ClassVar[typing.Dict[str, str]] = {
+        "/titles": "titles",
+        "/entries": "entries",
+        "/seasons": "seasons",
+    }
+
+    def __init__(
+        self,
+        loader: typing.Callable[[], media_library.VideoDatabase],
+        cache_size: int = 256,
+        window: int = 1024,
+    ) -> None:
+        self._loader = loader
+        self._cache_size = cache_size
+        self._cache: collections.OrderedDict = collections.OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._latencies: typing.Dict[str, typing.Deque[float]] = (
+            collections.defaultdict(lambda: collections.deque(maxlen=window))
+        )
+        self._counts: typing.Counter[str] = collections.Counter()
+        self.hits = 0
+        self.misses = 0
+        self._state: typing.Optional[_State] = None
+        self.reload()
+
+    @property
+    def generation(self) -> int:
+        assert self._state is not None
+        return self._state.generation
+
+    def reload(self) -> int:
+        with self._reload_lock:
+            database = self._loader()
+            rows = list(
+                records.iter_records([*database.movies, *database.series])
+            )
+            generation = 0 if self._state is None else self.generation + 1
+            self._state = _State(
+                generation,
+                database,
+                search.TitleIndex.from_database(database),
+                rows,
+                _postings(rows),
+            )
+            with self._cache_lock:
+                self._cache.clear()
+            return generation
+
+    def titles(self, state: _State, params: Params) -> Payload:
+        query = _param(params, "q")
+        if not query:
+            raise ServiceError(400, "missing q")
+        kind = _param(params, "kind")
+        matches = state.index.search(
+            query,
+            k=_int_param(params, "k", 10),
+            kinds=None if kind is None else {kind},
+        )
+        return [
+            dict(dataclasses.asdict(match.document), score=match.score)
+            for match in matches
+        ]
+
+    def entries(self, state: _State, params: Params) -> Payload:
+        selected: typing.Optional[typing.Set[int]] = None
+        for name in FILTERS:
+            value = _param(params, name)
+            if value is None:
+                continue
+            if name == "show":
+                value = merge.normalize_title(value)
+            found = state.postings[name].get(value.lower(), set())
+            selected = found if selected is None else selected & found
+        if selected is None:
+            positions: typing.Iterable[int] = range(len(state.records))
+        else:
+            positions = sorted(selected)
+        limit = _int_param(params, "limit", 100)
+        return [
+            state.records[i] for i in itertools.islice(positions, limit)
+        ]
+
+    def seasons(self, state: _State, params: Params) -> Payload:
+        show = merge.normalize_title(_param(params, "show"))
+        if not show:
+            raise ServiceError(400, "missing show")
+        for series in state.database.series:
+            if merge.normalize_title(series.title) != show:
+                continue
+            seasons: typing.Dict[typing.Any, typing.List] = {}
+            for episode in series.episodes:
+                seasons.setdefault(episode.season, []).append(
+                    {"episode": episode.episode, "title": episode.title}
+                )
+            return {
+                "show": series.title,
+                "seasons": [
+                    {"season": season, "episodes": episodes}
+                    for season, episodes in sorted(
+                        seasons.items(),
+                        key=lambda item: (item[0] is None, item[0] or 0),
+                    )
+                ],
+            }
+        raise ServiceError(404, f"unknown show {_param(params, 'show')!r}")
+
+    def metrics(self) -> Payload:
+        with self._metrics_lock:
+            endpoints = {
+                name: {
+                    "count": self._counts[name],
+                    "mean_ms": statistics.fmean(window) * 1e3,
+                    "p50_ms": _percentile(window, 0.50) * 1e3,
+                    "p95_ms": _percentile(window, 0.95) * 1e3,
+                    "max_ms": max(window) * 1e3,
+                }
+                for name, window in self._latencies.items()
+                if window
+            }
+        return {
+            "generation": self.generation,
+            "cache": {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+            },
+            "endpoints": endpoints,
+        }
+
+    def query(self, path: str, params: Params) -> Payload:
+        if path == "/metrics":
+            return self.metrics()
+        name = self.ROUTES.get(path)
+        if name is None:
+            raise ServiceError(404, f"unknown endpoint {path!r}")
+        state = self._state
+        assert state is not None
+        key = (
+            state.generation,
+            path,
+            tuple(sorted((k, tuple(v)) for k, v in params.items())),
+        )
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        result = getattr(self, name)(state, params)
+        with self._cache_lock:
+            if state.generation == self.generation:
+                self._cache[key] = result
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def record(self, path: str, seconds: float) -> None:
+        with self._metrics_lock:
+            self._counts[path] += 1
+            self._latencies[path].append(seconds)
+
+
+def _percentile(values: typing.Iterable[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    service: LibraryService
+
+    def _send(self, status: int, payload: Payload) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, func: typing.Callable[[], Payload]) -> None:
+        start = time.perf_counter()
+        path = urllib.parse.urlsplit(self.path).path
+        try:
+            status, payload = 200, func()
+        except ServiceError as error:
+            status, payload = error.status, {"error": str(error)}
+        except Exception as error:
+            message = f"{type(error).__name__}: {error}"
+            status, payload = 500, {"error": message}
+        self._send(status, payload)
+        if status == 404:
+            path = "unknown"
+        self.service.record(path, time.perf_counter() - start)
+
+    def do_GET(self) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        self._dispatch(lambda: self.service.query(url.path, params))
+
+    def do_POST(self) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != "/reload":
+            self._dispatch(lambda: _not_found(url.path))
+            return
+        self._dispatch(lambda: {"generation": self.service.reload()})
+
+    def log_message(self, format: str, *args: typing.Any) -> None:
+        pass
+
+    def address_string(self) -> str:
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return "unix"
+
+
+def _not_found(path: str) -> Payload:
+    raise ServiceError(404, f"unknown endpoint {path!r}")
+
+
+class UnixHTTPServer(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    daemon_threads = True
+
+
+def make_server(
+    service: LibraryService, address: Address
+) -> socketserver.BaseServer:
+    handler = type("Handler", (RequestHandler,), {"service": service})
+    if isinstance(address, tuple):
+        return http.server.ThreadingHTTPServer(address, handler)
+    path = os.fspath(address)
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+    return UnixHTTPServer(path, handler)
@@ -0,0 +1,421 @@
+# %%
+
+from __future__ import annotations
+
+
+import datetime
+import struct
+import sys
+import typing
+from multiprocessing import shared_memory
+from . import media_library
+
+MAGIC = b"MKVLIB01"
+NONE = -(2**31)
+
+_HEADER = struct.Struct("<8s10I")
+_ENTRY = struct.Struct("<BiiiiiiIHHHii")
+_STREAM = struct.Struct("<Biiiii")
+_SERIES = struct.Struct("<iiiiII")
+_OFFSET = struct.Struct("<I")
+
+MOVIE, EPISODE = 0, 1
+VIDEO, AUDIO, SUB = 0, 1, 2
+
+
+def _int(value: typing.Optional[int]) -> int:
+    return NONE if value is None else value
+
+
+def _opt(value: int) -> typing.Optional[int]:
+    return None if value == NONE else value
+
+
+class _Strings:
+    def __init__(self) -> None:
+        self.index: typing.Dict[typing.Optional[str], int] = {None: NONE}
+        self.values: typing.List[bytes] = []
+
+    def __call__(self, value: typing.Optional[str]) -> int:
+        found = self.index.get(value)
+        if found is None:
+            found = self.index[value] = len(self.values)
+            self.values.append(typing.cast(str, value).encode())
+        return found
+
+
+class _Layout:
+    def __init__(self, database: media_library.VideoDatabase) -> None:
+        self.strings = _Strings()
+        self.entries: typing.List[bytes] = []
+        self.streams: typing.List[bytes] = []
+        self.series: typing.List[bytes] = []
+        self.movies = len(database.movies)
+        for movie in database.movies:
+            self.add_entry(MOVIE, movie, NONE)
+        for index, series in enumerate(database.series):
+            first = len(self.entries)
+            for episode in series.episodes:
+                self.add_entry(EPISODE, episode, index)
+            self.series.append(
+                _SERIES.pack(
+                    self.strings(series.title),
+                    _int(series.year),
+                    _int(series.season),
+                    _int(series.episode),
+                    first,
+                    len(series.episodes),
+                )
+            )
+
+    def add_entry(
+        self,
+        kind: int,
+        entry: typing.Union[media_library.Movie, media_library.Episode],
+        series: int,
+    ) -> None:
+        strings = self.strings
+        start = len(self.streams)
+        streams = entry.streams
+        for video in streams.videos:
+            self.streams.append(
+                _STREAM.pack(
+                    VIDEO,
+                    strings(video.codec),
+                    NONE,
+                    _int(video.width),
+                    _int(video.height),
+                    NONE,
+                )
+            )
+        for audio in streams.audios:
+            self.streams.append(
+                _STREAM.pack(
+                    AUDIO,
+                    strings(audio.codec),
+                    strings(audio.language),
+                    NONE,
+                    NONE,
+                    _int(audio.channels),
+                )
+            )
+        for sub in streams.subs:
+            self.streams.append(
+                _STREAM.pack(
+                    SUB, NONE, strings(sub.language), NONE, NONE, NONE
+                )
+            )
+        is_episode = kind == EPISODE
+        self.entries.append(
+            _ENTRY.pack(
+                kind,
+                strings(entry.title),
+                _int(entry.year),
+                NONE
+                if entry.duration is None
+                else int(entry.duration.total_seconds()),
+                _int(entry.season) if is_episode else NONE,
+                _int(entry.episode) if is_episode else NONE,
+                series,
+                start,
+                len(streams.videos),
+                len(streams.audios),
+                len(streams.subs),
+                strings(entry.path),
+                strings(entry.filename_and_path),
+            )
+        )
+
+    def pack(self) -> bytes:
+        values = self.strings.values
+        offsets = [0]
+        for value in values:
+            offsets.append(offsets[-1] + len(value))
+        index = b"".join(_OFFSET.pack(offset) for offset in offsets)
+        blob = b"".join(values)
+        sections = [
+            index,
+            blob,
+            b"".join(self.entries),
+            b"".join(self.streams),
+            b"".join(self.series),
+        ]
+        positions = []
+        position = _HEADER.size
+        for section in sections:
+            positions.append(position)
+            position += len(section)
+        header = _HEADER.pack(
+            MAGIC,
+            len(values),
+            self.movies,
+            len(self.entries),
+            len(self.streams),
+            len(self.series),
+            *positions,
+        )
+        return header + b"".join(sections)
+
+
+class EntryView:
+    __slots__ = ("_library", "_fields")
+
+    def __init__(self, library: SharedLibrary, index: int) -> None:
+        self._library = library
+        self._fields = _ENTRY.unpack_from(
+            library.buffer, library._entries + index * _ENTRY.size
+        )
+
+    @property
+    def kind(self) -> str:
+        return "movie" if self._fields[0] == MOVIE else "episode"
+
+    @property
+    def title(self) -> typing.Optional[str]:
+        return self._library.string(self._fields[1])
+
+    @property
+    def year(self) -> typing.Optional[int]:
+        return _opt(self._fields[2])
+
+    @property
+    def duration(self) -> typing.Optional[datetime.timedelta]:
+        seconds = _opt(self._fields[3])
+        return None if seconds is None else datetime.timedelta(seconds=seconds)
+
+    @property
+    def season(self) -> typing.Optional[int]:
+        return _opt(self._fields[4])
+
+    @property
+    def episode(self) -> typing.Optional[int]:
+        return _opt(self._fields[5])
+
+    @property
+    def path(self) -> typing.Optional[str]:
+        return self._library.string(self._fields[11])
+
+    @property
+    def filename_and_path(self) -> typing.Optional[str]:
+        return self._library.string(self._fields[12])
+
+    def _streams(self, skip: int, count: int) -> typing.Iterator[tuple]:
+        library = self._library
+        start = library._streams + (self._fields[7] + skip) * _STREAM.size
+        for offset in range(start, start + count * _STREAM.size, _STREAM.size):
+            yield _STREAM.unpack_from(library.buffer, offset)
+
+    @property
+    def video_streams(self) -> typing.Iterator[media_library.VideoStream]:
+        string = self._library.string
+        for _, codec, _, width, height, _ in self._streams(0, self._fields[8]):
+            yield media_library.VideoStream(
+                codec=string(codec), width=_opt(width), height=_opt(height)
+            )
+
+    @property
+    def audio_streams(self) -> typing.Iterator[media_library.AudioStream]:
+        string = self._library.string
+        streams = self._streams(self._fields[8], self._fields[9])
+        for _, codec, language, _, _, channels in streams:
+            yield media_library.AudioStream(
+                codec=string(codec),
+                language=string(language),
+                channels=_opt(channels),
+            )
+
+    @property
+    def sub_streams(self) -> typing.Iterator[media_library.SubStream]:
+        string = self._library.string
+        skip = self._fields[8] + self._fields[9]
+        for stream in self._streams(skip, self._fields[10]):
+            yield media_library.SubStream(language=string(stream[2]))
+
+    @property
+    def streams(self) -> media_library.StreamDetails:
+        return media_library.StreamDetails(
+            videos=tuple(self.video_streams),
+            audios=tuple(self.audio_streams),
+            subs=tuple(self.sub_streams),
+        )
+
+    def materialize(
+        self,
+    ) -> typing.Union[media_library.Movie, media_library.Episode]:
+        if self._fields[0] == MOVIE:
+            return media_library.Movie(
+                title=self.title,
+                year=self.year,
+                duration=self.duration,
+                streams=self.streams,
+                path=self.path,
+                filename_and_path=self.filename_and_path,
+            )
+        return media_library.Episode(
+            title=self.title,
+            year=self.year,
+            duration=self.duration,
+            season=self.season,
+            episode=self.episode,
+            streams=self.streams,
+            path=self.path,
+            filename_and_path=self.filename_and_path,
+        )
+
+
+class EntriesView(typing.Sequence[EntryView]):
+    def __init__(self, library: SharedLibrary, start: int, count: int):
+        self._library = library
+        self._start = start
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    @typing.overload
+    def __getitem__(self, index: int) -> EntryView:
+        ...
+
+    @typing.overload
+    def __getitem__(self, index: slice) -> typing.List[EntryView]:
+        ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return EntryView(self._library, self._start + index)
+
+
+class SeriesView:
+    __slots__ = ("_library", "_fields")
+
+    def __init__(self, library: SharedLibrary, index: int) -> None:
+        self._library = library
+        self._fields = _SERIES.unpack_from(
+            library.buffer, library._series + index * _SERIES.size
+        )
+
+    @property
+    def title(self) -> typing.Optional[str]:
+        return self._library.string(self._fields[0])
+
+    @property
+    def year(self) -> typing.Optional[int]:
+        return _opt(self._fields[1])
+
+    @property
+    def season(self) -> typing.Optional[int]:
+        return _opt(self._fields[2])
+
+    @property
+    def episode(self) -> typing.Optional[int]:
+        return _opt(self._fields[3])
+
+    @property
+    def episodes(self) -> EntriesView:
+        return EntriesView(self._library, self._fields[4], self._fields[5])
+
+    def materialize(self) -> media_library.Series:
+        return media_library.Series(
+            title=self.title,
+            year=self.year,
+            season=self.season,
+            episode=self.episode,
+            episodes=[
+                typing.cast(media_library.Episode, e.materialize())
+                for e in self.episodes
+            ],
+        )
+
+
+class SharedLibrary:
+    def __init__(
+        self, memory: shared_memory.SharedMemory, owner: bool = False
+    ) -> None:
+        self.memory = memory
+        self.owner = owner
+        self.buffer = memory.buf.toreadonly()
+        try:
+            (
+                magic,
+                self._n_strings,
+                self._n_movies,
+                self._n_entries,
+                self._n_streams,
+                self._n_series,
+                self._index,
+                self._blob,
+                self._entries,
+                self._streams,
+                self._series,
+            ) = _HEADER.unpack_from(self.buffer, 0)
+        except struct.error:
+            magic = None
+        if magic != MAGIC:
+            self.buffer.release()
+            memory.close()
+            raise ValueError(f"{memory.name} is not a published library")
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def string(self, index: int) -> typing.Optional[str]:
+        if index == NONE:
+            return None
+        start, end = struct.unpack_from(
+            "<II", self.buffer, self._index + index * _OFFSET.size
+        )
+        return str(self.buffer[self._blob + start : self._blob + end], "utf-8")
+
+    @property
+    def movies(self) -> EntriesView:
+        return EntriesView(self, 0, self._n_movies)
+
+    @property
+    def series(self) -> typing.List[SeriesView]:
+        return [SeriesView(self, i) for i in range(self._n_series)]
+
+    def materialize(self) -> media_library.VideoDatabase:
+        return media_library.VideoDatabase(
+            movies=[
+                typing.cast(media_library.Movie, m.materialize())
+                for m in self.movies
+            ],
+            series=[s.materialize() for s in self.series],
+        )
+
+    def close(self) -> None:
+        self.buffer.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def __enter__(self) -> SharedLibrary:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def publish(
+    database: media_library.VideoDatabase, name: typing.Optional[str] = None
+) -> SharedLibrary:
+    data = _Layout(database).pack()
+    memory = shared_memory.SharedMemory(
+        name=name, create=True, size=max(len(data), 1)
+    )
+    memory.buf[: len(data)] = data
+    return SharedLibrary(memory, owner=True)
+
+
+def attach(name: str) -> SharedLibrary:
+    if sys.version_info >= (3, 13):
+        memory = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        memory = shared_memory.SharedMemory(name=name)
+    return SharedLibrary(memory)
@@ -0,0 +1,399 @@
+# %%
+
+from __future__ import annotations
+
+
+import bisect
+import ctypes
+import ctypes.util
+import dataclasses
+import os
+import select
+import struct
+import sys
+import threading
+import time
+import typing
+from . import library_dir
+from . import media_library
+from . import merge
+
+Entry: typing.TypeAlias = typing.Union[
+    media_library.Movie, media_library.Episode
+]
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+
+_EVENT = struct.Struct("iIII")
+
+
+class Backend(typing.Protocol):
+    def read(self, timeout: float) -> typing.Set[str]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+
+def _walk_files(root: str) -> typing.Iterator[os.DirEntry]:
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        yield entry
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+
+
+class PollingBackend:
+    def __init__(self, root: typing.Union[str, os.PathLike]):
+        self.root = os.fspath(root)
+        self._snapshot = self._scan()
+
+    def _scan(self) -> typing.Dict[str, typing.Tuple[int, int]]:
+        snapshot = {}
+        for entry in _walk_files(self.root):
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def read(self, timeout: float) -> typing.Set[str]:
+        time.sleep(timeout)
+        snapshot = self._scan()
+        previous, self._snapshot = self._snapshot, snapshot
+        changed = {
+            path
+            for path, state in snapshot.items()
+            if previous.get(path) != state
+        }
+        changed.update(path for path in previous if path not in snapshot)
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyBackend:
+    def __init__(self, root: typing.Union[str, os.PathLike]):
+        self.root = os.fspath(root)
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        )
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches: typing.Dict[int, str] = {}
+        self._watch_tree(self.root)
+
+    def _watch(self, directory: str) -> None:
+        wd = self._add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+        self._watches[wd] = directory
+
+    def _watch_tree(self, root: str) -> typing.Set[str]:
+        found: typing.Set[str] = set()
+        try:
+            self._watch(root)
+        except (FileNotFoundError, NotADirectoryError):
+            return found
+        for directory, subdirs, files in os.walk(root):
+            for name in list(subdirs):
+                try:
+                    self._watch(os.path.join(directory, name))
+                except (FileNotFoundError, NotADirectoryError):
+                    subdirs.remove(name)
+            found.update(os.path.join(directory, name) for name in files)
+        return found
+
+    def _unwatch_tree(self, root: str) -> None:
+        prefix = os.path.join(root, "")
+        for wd, directory in list(self._watches.items()):
+            if directory == root or directory.startswith(prefix):
+                del self._watches[wd]
+                self._rm_watch(self._fd, wd)
+
+    def _rescan(self) -> typing.Set[str]:
+        return self._watch_tree(self.root)
+
+    def read(self, timeout: float) -> typing.Set[str]:
+        changed: typing.Set[str] = set()
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return changed
+        while True:
+            try:
+                buffer = os.read(self._fd, 1 << 16)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, size = _EVENT.unpack_from(buffer, offset)
+                offset += _EVENT.size
+                name = buffer[offset : offset + size].rstrip(b"\0")
+                offset += size
+                if mask & IN_Q_OVERFLOW:
+                    changed.update(self._rescan())
+                    continue
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+                directory = self._watches.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_DELETE_SELF:
+                    self._unwatch_tree(directory)
+                    changed.add(directory)
+                    continue
+                if not name:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name))
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        changed.update(self._watch_tree(path))
+                    elif mask & (IN_MOVED_FROM | IN_DELETE):
+                        self._unwatch_tree(path)
+                        changed.add(path)
+                    continue
+                changed.add(path)
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def default_backend(root: typing.Union[str, os.PathLike]) -> Backend:
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyBackend(root)
+        except (OSError, AttributeError):
+            pass
+    return PollingBackend(root)
+
+
+@dataclasses.dataclass
+class Change:
+    action: str
+    path: str
+    entry: Entry
+    series: typing.Optional[media_library.Series] = None
+
+
+Subscriber: typing.TypeAlias = typing.Callable[[typing.List[Change]], None]
+
+
+class LibraryWatcher:
+    def __init__(
+        self,
+        root: typing.Union[str, os.PathLike],
+        database: typing.Optional[media_library.VideoDatabase] = None,
+        backend: typing.Optional[Backend] = None,
+        debounce: float = 0.5,
+        max_batch: int = 10000,
+        max_delay: float = 10.0,
+    ):
+        self.root = os.path.abspath(root)
+        self.database = database or media_library.VideoDatabase(
+            movies=[], series=[]
+        )
+        self.debounce = debounce
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._backend = backend
+        self._subscribers: typing.List[Subscriber] = []
+        self._entries: typing.Dict[
+            str, typing.Tuple[Entry, typing.Optional[media_library.Series]]
+        ] = {}
+        self._series = {
+            merge.normalize_title(series.title): series
+            for series in self.database.series
+        }
+        for entry in self.database.movies:
+            self._track(entry, None)
+        for series in self.database.series:
+            for episode in series.episodes:
+                self._track(episode, series)
+        self._paths = sorted(self._entries)
+        self.lock = threading.Lock()
+
+    def _track(
+        self, entry: Entry, series: typing.Optional[media_library.Series]
+    ) -> None:
+        nfo = library_dir.nfo_for(entry.filename_and_path or "")
+        if nfo is not None:
+            self._entries[os.path.abspath(nfo)] = (entry, series)
+
+    def _store(
+        self,
+        nfo: str,
+        entry: Entry,
+        series: typing.Optional[media_library.Series],
+    ) -> None:
+        if nfo not in self._entries:
+            bisect.insort(self._paths, nfo)
+        self._entries[nfo] = (entry, series)
+
+    def _discard(self, nfo: str) -> None:
+        if self._entries.pop(nfo, None) is not None:
+            del self._paths[bisect.bisect_left(self._paths, nfo)]
+
+    def subscribe(self, callback: Subscriber) -> None:
+        self._subscribers.append(callback)
+
+    def scan(self) -> typing.List[Change]:
+        return self.apply(library_dir.find_nfo_files(self.root))
+
+    def apply(self, paths: typing.Iterable[str]) -> typing.List[Change]:
+        nfos = {
+            os.path.abspath(nfo)
+            for nfo in map(library_dir.nfo_for, paths)
+            if nfo
+        }
+        changes: typing.List[Change] = []
+        replaced: typing.Dict[int, Entry] = {}
+        removed: typing.Set[int] = set()
+        with self.lock:
+            for nfo in sorted(nfos):
+                parsed = library_dir.parse_nfo(nfo)
+                previous = self._entries.get(nfo)
+                if parsed is None:
+                    if previous is not None:
+                        self._discard(nfo)
+                        entry, series = previous
+                        removed.add(id(entry))
+                        changes.append(Change("removed", nfo, entry, series))
+                    continue
+                show, entry = parsed
+                series = self._owning_series(show, entry)
+                if previous is not None and previous == (entry, series):
+                    continue
+                self._store(nfo, entry, series)
+                if previous is None:
+                    self._append(entry, series)
+                    changes.append(Change("added", nfo, entry, series))
+                    continue
+                old_entry, old_series = previous
+                if old_series is series:
+                    replaced[id(old_entry)] = entry
+                else:
+                    removed.add(id(old_entry))
+                    self._append(entry, series)
+                changes.append(Change("replaced", nfo, entry, series))
+            if replaced or removed:
+                self._rewrite(replaced, removed)
+        if changes:
+            for callback in self._subscribers:
+                callback(changes)
+        return changes
+
+    def expand(self, paths: typing.Iterable[str]) -> typing.Set[str]:
+        found = set()
+        with self.lock:
+            known = self._paths
+            for path in paths:
+                if library_dir.nfo_for(path):
+                    found.add(path)
+                    continue
+                prefix = os.path.join(os.path.abspath(path), "")
+                index = bisect.bisect_left(known, prefix)
+                while index < len(known) and known[index].startswith(prefix):
+                    found.add(known[index])
+                    index += 1
+        return found
+
+    def _owning_series(
+        self, show: typing.Optional[str], entry: Entry
+    ) -> typing.Optional[media_library.Series]:
+        if isinstance(entry, media_library.Movie):
+            return None
+        key = merge.normalize_title(show)
+        series = self._series.get(key)
+        if series is None:
+            series = media_library.Series(title=show, year=entry.year)
+            self._series[key] = series
+            self.database.series.append(series)
+        return series
+
+    def _append(
+        self, entry: Entry, series: typing.Optional[media_library.Series]
+    ) -> None:
+        if series is None:
+            self.database.movies.append(
+                typing.cast(media_library.Movie, entry)
+            )
+        else:
+            series.episodes.append(typing.cast(media_library.Episode, entry))
+
+    def _rewrite(
+        self, replaced: typing.Dict[int, Entry], removed: typing.Set[int]
+    ) -> None:
+        def update(entries: typing.List) -> typing.List:
+            return [
+                replaced.get(id(entry), entry)
+                for entry in entries
+                if id(entry) not in removed
+            ]
+
+        self.database.movies[:] = update(self.database.movies)
+        emptied = set()
+        for series in self.database.series:
+            if series.episodes:
+                series.episodes[:] = update(series.episodes)
+                if not series.episodes:
+                    emptied.add(id(series))
+                    key = merge.normalize_title(series.title)
+                    self._series.pop(key, None)
+        self.database.series[:] = [
+            s for s in self.database.series if id(s) not in emptied
+        ]
+
+    def run(self, stop: typing.Optional[threading.Event] = None) -> None:
+        stop = stop or threading.Event()
+        backend = self._backend or default_backend(self.root)
+        pending: typing.Set[str] = set()
+        since = time.monotonic()
+        try:
+            while not stop.is_set():
+                paths = backend.read(self.debounce)
+                if not pending:
+                    since = time.monotonic()
+                pending.update(self.expand(paths))
+                if pending and (
+                    not paths
+                    or len(pending) >= self.max_batch
+                    or time.monotonic() - since > self.max_delay
+                ):
+                    self.apply(pending)
+                    pending = set()
+            if pending:
+                self.apply(pending)
+        finally:
+            backend.close()
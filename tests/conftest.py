@@ -0,0 +1,26 @@
+import copy
+from pathlib import Path
+
+import pytest
+
+import mkv_info.library_xml
+import mkv_info.records
+
+DATA_DIR = Path("data")
+
+
+@pytest.fixture(scope="session")
+def sample_library():
+    return mkv_info.library_xml.XML_Parser.parse_file(
+        DATA_DIR / "videodb_min.xml"
+    )
+
+
+@pytest.fixture()
+def library(sample_library):
+    return copy.deepcopy(sample_library)
+
+
+@pytest.fixture()
+def entries(library):
+    return [entry for _, entry in mkv_info.records.iter_entries(library)]
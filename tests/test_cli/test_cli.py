@@ -0,0 +1,175 @@
+import csv
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import mkv_info.cli
+import mkv_info.library_xml
+
+DATA_DIR = Path("data")
+
+MOVIE_NFO = """
+<movie>
+    <title>Cars</title>
+    <year>2006</year>
+    <runtime>117</runtime>
+    <fileinfo>
+        <streamdetails>
+            <video><codec>h264</codec><width>1920</width></video>
+            <audio><language>eng</language></audio>
+        </streamdetails>
+    </fileinfo>
+</movie>
+"""
+
+EPISODE_NFO = """
+<episodedetails>
+    <title>Mhysa</title>
+    <season>3</season>
+    <episode>10</episode>
+</episodedetails>
+"""
+
+
+def _library_dir(root: Path) -> Path:
+    (root / "films" / "Cars (2006)").mkdir(parents=True)
+    (root / "films" / "Cars (2006)" / "Cars (2006).nfo").write_text(MOVIE_NFO)
+    season = root / "series" / "Game of Thrones" / "Season03"
+    season.mkdir(parents=True)
+    (season.parent / "tvshow.nfo").write_text(
+        "<tvshow><title>Game of Thrones</title></tvshow>"
+    )
+    (season / "S03E10.nfo").write_text(EPISODE_NFO)
+    return root
+
+
+def test_parse_xml_jsonl(capsys) -> None:
+    assert (
+        mkv_info.cli.main(
+            [
+                "parse",
+                str(DATA_DIR / "videodb_min.xml"),
+                "--fields",
+                "kind,show,title,duration",
+            ]
+        )
+        == 0
+    )
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert rows[0] == {
+        "kind": "movie",
+        "show": None,
+        "title": "2001: A Space Odyssey",
+        "duration": 149 * 60,
+    }
+    assert sum(row["kind"] == "movie" for row in rows) == 4
+    assert rows[-1]["show"] == "Unsere Mütter, unsere Väter"
+
+
+def test_parse_directory_csv(tmp_path, capsys) -> None:
+    root = _library_dir(tmp_path)
+    argv = ["parse", str(root), "--format", "csv", "--fields", "show,title"]
+    assert mkv_info.cli.main(argv + ["--jobs", "2"]) == 0
+    rows = list(csv.reader(io.StringIO(capsys.readouterr().out)))
+    assert rows == [
+        ["show", "title"],
+        ["", "Cars"],
+        ["Game of Thrones", "Mhysa"],
+    ]
+
+
+def test_unknown_field(capsys) -> None:
+    argv = ["parse", str(DATA_DIR / "videodb_min.xml"), "--fields", "bogus"]
+    assert mkv_info.cli.main(argv) == 2
+    assert "bogus" in capsys.readouterr().err
+
+
+def test_lazy_imports() -> None:
+    code = (
+        "import sys, mkv_info.cli; "
+        "mkv_info.cli.build_parser(); "
+        "print('mkv_info.library_xml' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_parallel_sources_match_sequential(tmp_path, capsys) -> None:
+    root = _library_dir(tmp_path)
+    argv = ["parse", str(DATA_DIR / "videodb_min.xml"), str(root)]
+    assert mkv_info.cli.main(argv) == 0
+    sequential = capsys.readouterr().out
+    assert mkv_info.cli.main(argv + ["--jobs", "2"]) == 0
+    assert capsys.readouterr().out == sequential
+
+
+def test_records_stream_before_source_is_parsed(tmp_path) -> None:
+    sources = [str(DATA_DIR / "videodb_min.xml"), str(tmp_path / "missing")]
+    records = mkv_info.cli.iter_records(sources, jobs=2)
+    assert next(records)["title"] == "2001: A Space Odyssey"
+    records.close()
+
+
+def test_bare_media_directory_warns(tmp_path, capsys) -> None:
+    (tmp_path / "Cars (2006).mkv").write_bytes(b"")
+    assert mkv_info.cli.main(["parse", str(tmp_path)]) == 0
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "not probed" in captured.err
+
+
+def test_unknown_dimensions_stay_empty(tmp_path, capsys) -> None:
+    root = _library_dir(tmp_path)
+    argv = ["parse", str(root), "--fields", "title,width,height"]
+    assert mkv_info.cli.main(argv) == 0
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert rows == [
+        {"title": "Cars", "width": 1920, "height": None},
+        {"title": "Mhysa", "width": None, "height": None},
+    ]
+
+
+def test_entry_blocks_across_chunk_boundaries() -> None:
+    source = DATA_DIR / "videodb_min.xml"
+    blocks = list(mkv_info.library_xml.iter_entry_blocks(source))
+    assert [
+        mkv_info.library_xml.XML_Parser.parse_entry_block(block)
+        for block in blocks
+    ] == list(mkv_info.library_xml.XML_Parser.iter_entries(source))
+    for chunk_size in (1, 7, 4096):
+        assert (
+            list(mkv_info.library_xml.iter_entry_blocks(source, chunk_size))
+            == blocks
+        )
+
+
+def test_parallel_parse_honours_declared_encoding(tmp_path, capsys) -> None:
+    export = tmp_path / "videodb.xml"
+    export.write_bytes(
+        b'<?xml version="1.0" encoding="ISO-8859-1"?>\n<videodb>'
+        + "<movie><title>Unsere Mütter</title></movie>".encode("latin1")
+        + b"</videodb>"
+    )
+    argv = ["parse", str(export), "--fields", "title"]
+    assert mkv_info.cli.main(argv) == 0
+    sequential = capsys.readouterr().out
+    assert "Unsere Mütter" in sequential
+    assert mkv_info.cli.main(argv + ["--jobs", "2"]) == 0
+    assert capsys.readouterr().out == sequential
+
+
+def test_unreadable_sources_are_reported(tmp_path, capsys) -> None:
+    missing = tmp_path / "missing.xml"
+    assert mkv_info.cli.main(["parse", str(missing)]) == 2
+    assert capsys.readouterr().err == (
+        f"mkv-info: {missing}: No such file or directory\n"
+    )
+    broken = tmp_path / "broken.xml"
+    broken.write_text("<videodb><movie><title>Cars</movie></videodb>")
+    for jobs in ("1", "2"):
+        assert mkv_info.cli.main(["parse", str(broken), "-j", jobs]) == 2
+        assert capsys.readouterr().err.startswith(f"mkv-info: {broken}: ")
@@ -0,0 +1,103 @@
+import collections
+import dataclasses
+
+import pytest
+
+import mkv_info.cube
+import mkv_info.media_library
+
+
+def _cells(cube):
+    return {
+        subset: {c: (m.count, round(m.seconds)) for c, m in cells.items()}
+        for subset, cells in cube._cuboids.items()
+    }
+
+
+def test_matches_full_scan(library, entries) -> None:
+    cube = mkv_info.cube.Cube.build(library)
+    assert cube.total.count == len(entries)
+
+    hours = collections.Counter()
+    for entry in entries:
+        for codec in {v.codec for v in entry.video_streams}:
+            hours[codec] += entry.duration.total_seconds() / 3600
+    by_codec = cube.group_by("codec")
+    assert {k[0]: m.hours for k, m in by_codec.items()} == pytest.approx(
+        dict(hours)
+    )
+
+    movies = cube.get(kind="movie")
+    assert movies.count == len(library.movies)
+    assert cube.get(kind="movie", resolution="1080p").count == sum(
+        1
+        for movie in library.movies
+        if any(v.width >= 1800 for v in movie.video_streams)
+    )
+    per_show = cube.group_by("language", show="Game of Thrones")
+    assert per_show[("eng",)].count == len(library.series[0].episodes)
+    assert cube.get(codec="vp9").count == 0
+
+
+def test_incremental(library) -> None:
+    cube = mkv_info.cube.Cube.build(library)
+    series = library.series[0]
+    removed = series.episodes.pop()
+    cube.remove(removed, series)
+    movie = library.movies.pop(0)
+    cube.remove(movie)
+    assert _cells(cube) == _cells(mkv_info.cube.Cube.build(library))
+
+    library.movies.append(movie)
+    cube.add(movie)
+    series.episodes.append(removed)
+    cube.add(removed, series)
+    assert _cells(cube) == _cells(mkv_info.cube.Cube.build(library))
+
+
+def test_custom_dimensions() -> None:
+    cube = mkv_info.cube.Cube(
+        ("kind", "decade"),
+        extra={"decade": lambda entry, _: ((entry.year or 0) // 10 * 10,)},
+    )
+    cube.add(mkv_info.media_library.Movie(title="Cars", year=2006))
+    assert cube.group_by("decade") == {
+        (2000,): mkv_info.cube.Measure(count=1)
+    }
+    with pytest.raises(KeyError):
+        cube.get(codec="h264")
+    with pytest.raises(KeyError):
+        mkv_info.cube.Cube(("bogus",))
+
+
+def test_remove_unknown_entry(library) -> None:
+    cube = mkv_info.cube.Cube.build(library)
+    before = _cells(cube)
+    with pytest.raises(KeyError):
+        cube.remove(mkv_info.media_library.Movie(title="Cars", year=2006))
+    movie = library.movies[0]
+    with pytest.raises(KeyError):
+        cube.remove(dataclasses.replace(movie))
+    assert _cells(cube) == before
+
+
+def test_remove_entry_changed_after_add(library, entries) -> None:
+    cube = mkv_info.cube.Cube.build(library)
+    movie = library.movies[0]
+    year = movie.year
+    movie.year = 1900
+    cube.remove(movie)
+    assert cube.get(year=1900).count == 0
+    assert cube.get(year=year).count == sum(
+        m.year == year for m in library.movies
+    )
+    assert cube.total.count == len(entries) - 1
+
+
+def test_episode_without_series_is_an_episode(library) -> None:
+    cube = mkv_info.cube.Cube(("kind",))
+    cube.add(library.series[0].episodes[0])
+    assert cube.group_by("kind") == {
+        ("episode",): cube.get(kind="episode")
+    }
+    assert cube.get(kind="movie").count == 0
@@ -0,0 +1,73 @@
+import random
+import re
+from pathlib import Path
+
+import pytest
+
+import mkv_info.grouping
+
+DATA_DIR = Path("data")
+
+
+@pytest.fixture()
+def expected(library):
+    return [
+        (
+            series.title,
+            sorted(series.episodes, key=lambda e: (e.season, e.episode)),
+        )
+        for series in sorted(library.series, key=lambda s: s.title)
+    ]
+
+
+def _grouped(series):
+    return [(s.title, s.episodes) for s in series]
+
+
+@pytest.mark.parametrize("budget", [1 << 30, 4096, 1])
+def test_matches_in_memory_series(expected, budget, tmp_path) -> None:
+    pairs = mkv_info.grouping.iter_episode_pairs(
+        [DATA_DIR / "videodb_min.xml"]
+    )
+    grouper = mkv_info.grouping.EpisodeGrouper(budget, tmp_path, fanout=4)
+    for show, episode in pairs:
+        grouper.add(show, episode)
+    assert _grouped(grouper) == expected
+    if budget < 1 << 30:
+        assert grouper.spilled > 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_flat_exports_across_files(expected, tmp_path) -> None:
+    data = (DATA_DIR / "videodb_min.xml").read_text(encoding="utf-8")
+    blocks = re.findall(
+        r"<episodedetails>.*?</episodedetails>", data, re.DOTALL
+    )
+    random.Random(5).shuffle(blocks)
+    sources = []
+    for part in range(3):
+        body = "\n".join(blocks[part::3])
+        if part == 1:
+            body = body.replace(
+                "<showtitle>Game of Thrones</showtitle>",
+                "<showtitle>Game Of Thrones</showtitle>",
+            )
+        path = tmp_path / f"part{part}.xml"
+        path.write_text(f"<videodb>\n{body}\n</videodb>", encoding="utf-8")
+        sources.append(path)
+
+    pairs = list(mkv_info.grouping.iter_episode_pairs(sources))
+    assert {show for show, _ in pairs} >= {
+        "Game of Thrones",
+        "Game Of Thrones",
+    }
+    grouped = mkv_info.grouping.group_episodes(pairs, memory_budget=8192)
+    result = _grouped(grouped)
+    assert len(result) == len(expected)
+    for (title, episodes), (reference_title, reference) in zip(
+        result, expected
+    ):
+        assert title.casefold() == reference_title.casefold()
+        key = [(e.season, e.episode) for e in episodes]
+        assert key == [(e.season, e.episode) for e in reference]
+        assert sorted(map(repr, episodes)) == sorted(map(repr, reference))
@@ -0,0 +1,146 @@
+import datetime
+import struct
+
+import pytest
+
+import mkv_info.matroska
+import mkv_info.media_library
+
+M = mkv_info.matroska
+
+
+def element(element_id: int, payload: bytes) -> bytes:
+    ident = element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+    return ident + b"\x01" + len(payload).to_bytes(7, "big") + payload
+
+
+def uint(element_id: int, value: int, width: int = 8) -> bytes:
+    return element(element_id, value.to_bytes(width, "big"))
+
+
+def block(track: int, relative: int, size: int) -> bytes:
+    return bytes([0x80 | track]) + struct.pack(">hB", relative, 0x80) + (
+        b"\0" * size
+    )
+
+
+def cluster(timestamp: int) -> bytes:
+    children = [uint(M.TIMESTAMP, timestamp)]
+    for frame in range(50):
+        if frame % 2 == 0:
+            children.append(
+                element(M.SIMPLE_BLOCK, block(1, frame * 20, 100))
+            )
+        children.append(
+            element(
+                M.BLOCK_GROUP, element(M.BLOCK, block(2, frame * 20, 20))
+            )
+        )
+    return element(M.CLUSTER, b"".join(children))
+
+
+def write_mkv(path, clusters: int) -> None:
+    info = element(
+        M.INFO,
+        uint(M.TIMESTAMP_SCALE, 1_000_000)
+        + element(M.DURATION, struct.pack(">d", clusters * 1000.0)),
+    )
+    tracks = element(
+        M.TRACKS,
+        element(
+            M.TRACK_ENTRY,
+            uint(M.TRACK_NUMBER, 1)
+            + uint(M.TRACK_TYPE, 1)
+            + element(M.CODEC_ID, b"V_MPEGH/ISO/HEVC"),
+        )
+        + element(
+            M.TRACK_ENTRY,
+            uint(M.TRACK_NUMBER, 2)
+            + uint(M.TRACK_TYPE, 2)
+            + element(M.CODEC_ID, b"A_AC3"),
+        ),
+    )
+    body = [cluster(i * 1000) for i in range(clusters)]
+
+    def seek_head(positions):
+        return element(
+            M.SEEK_HEAD,
+            b"".join(
+                element(
+                    M.SEEK,
+                    uint(M.SEEK_ID, element_id, 4)
+                    + uint(M.SEEK_POSITION, position),
+                )
+                for element_id, position in positions
+            ),
+        )
+
+    head_size = len(seek_head([(M.INFO, 0), (M.TRACKS, 0), (M.CUES, 0)]))
+    position = head_size + len(info) + len(tracks)
+    cue_points = []
+    for index, data in enumerate(body):
+        cue_points.append(
+            element(
+                M.CUE_POINT,
+                uint(M.CUE_TIME, index * 1000)
+                + element(
+                    M.CUE_TRACK_POSITIONS,
+                    uint(0xF7, 1) + uint(M.CUE_CLUSTER_POSITION, position),
+                ),
+            )
+        )
+        position += len(data)
+    head = seek_head(
+        [
+            (M.INFO, head_size),
+            (M.TRACKS, head_size + len(info)),
+            (M.CUES, position),
+        ]
+    )
+    segment = head + info + tracks + b"".join(body)
+    segment += element(M.CUES, b"".join(cue_points))
+    header = element(M.EBML, uint(0x4282, 0) + element(0x4282, b"matroska"))
+    with open(path, "wb") as stream:
+        stream.write(header + element(M.SEGMENT, segment))
+
+
+def test_probe(tmp_path) -> None:
+    path = tmp_path / "movie.mkv"
+    write_mkv(path, clusters=200)
+    result = M.probe(path, samples=8)
+    assert result.tracks == [
+        M.Track(1, "video", "V_MPEGH/ISO/HEVC"),
+        M.Track(2, "audio", "A_AC3"),
+    ]
+    assert 0 < result.clusters_sampled <= 8
+    video = result.bitrates[1]
+    assert video.bits_per_second == pytest.approx(25 * 100 * 8)
+    assert video.low <= video.bits_per_second <= video.high
+    assert result.bitrates[2].bits_per_second == pytest.approx(50 * 20 * 8)
+    assert result.duration == datetime.timedelta(seconds=200)
+    assert result.duration_error == datetime.timedelta(milliseconds=20)
+    assert result.declared_duration == datetime.timedelta(seconds=200)
+    assert result.bytes_read < path.stat().st_size / 5
+
+
+def test_attach_bitrates(tmp_path) -> None:
+    path = tmp_path / "movie.mkv"
+    write_mkv(path, clusters=10)
+    streams = mkv_info.media_library.StreamDetails(
+        videos=(mkv_info.media_library.VideoStream(codec="hevc"),),
+        audios=(mkv_info.media_library.AudioStream(codec="ac3"),),
+        subs=(mkv_info.media_library.SubStream(language="eng"),),
+    )
+    annotated = M.attach_bitrates(streams, M.probe(path))
+    assert annotated == streams
+    assert annotated.videos[0].bitrate.bits_per_second == pytest.approx(
+        20000
+    )
+    assert annotated.audios[0].bitrate.bits_per_second == pytest.approx(8000)
+
+
+def test_not_matroska(tmp_path) -> None:
+    path = tmp_path / "movie.mkv"
+    path.write_bytes(b"<videodb/>" * 4)
+    with pytest.raises(M.MatroskaError):
+        M.probe(path)
@@ -0,0 +1,79 @@
+import shutil
+from pathlib import Path
+
+import mkv_info.library_xml
+import mkv_info.media_library
+import mkv_info.merge
+
+DATA_DIR = Path("data")
+
+
+def _movie(title, year, width, height, audios=1):
+    return mkv_info.media_library.Movie(
+        title=title,
+        year=year,
+        streams=mkv_info.media_library.StreamDetails(
+            videos=(
+                mkv_info.media_library.VideoStream(
+                    codec="h264", width=width, height=height
+                ),
+            ),
+            audios=tuple(
+                mkv_info.media_library.AudioStream(language="eng")
+                for _ in range(audios)
+            ),
+        ),
+    )
+
+
+def test_normalize_title() -> None:
+    normalize = mkv_info.merge.normalize_title
+    assert normalize("2001: A Space Odyssey") == "2001 a space odyssey"
+    assert normalize("Unsere Mütter,  unsere Väter") == (
+        "unsere mutter unsere vater"
+    )
+    assert normalize(None) == ""
+
+
+def test_policies() -> None:
+    small = mkv_info.media_library.VideoDatabase(
+        movies=[_movie("Cars", 2006, 1280, 720, audios=3)], series=[]
+    )
+    large = mkv_info.media_library.VideoDatabase(
+        movies=[_movie("cars", 2006, 1920, 1080)], series=[]
+    )
+    merged = mkv_info.merge.merge_databases([small, large])
+    assert len(merged.database.movies) == 1
+    assert merged.database.movies[0] is large.movies[0]
+    assert len(merged.movie_copies[("cars", 2006)]) == 2
+
+    merged = mkv_info.merge.merge_databases(
+        [small, large], policies=["most_audio_tracks"]
+    )
+    assert merged.database.movies[0] is small.movies[0]
+
+    merged = mkv_info.merge.merge_databases(
+        [large, small], policies=["newest"], mtimes=[2.0, 1.0]
+    )
+    assert merged.database.movies[0] is large.movies[0]
+
+
+def test_merge_exports(tmp_path) -> None:
+    paths = []
+    for name in ("living_room.xml", "nas.xml"):
+        shutil.copy(DATA_DIR / "videodb_min.xml", tmp_path / name)
+        paths.append(tmp_path / name)
+    library = mkv_info.library_xml.XML_Parser.parse_file(paths[0])
+
+    merged = mkv_info.merge.parse_exports(paths, jobs=2)
+    assert len(merged.database.movies) == len(library.movies)
+    assert len(merged.database.series) == len(library.series)
+    assert all(len(c) == 2 for c in merged.movie_copies.values())
+    got = merged.database.series[0]
+    assert got.title == "Game of Thrones"
+    assert len(got.episodes) == len(
+        {(e.season, e.episode) for e in library.series[0].episodes}
+    )
+    assert len(list(merged.duplicates)) == len(merged.movie_copies) + len(
+        merged.episode_copies
+    )
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pytest
+
+import mkv_info.library_xml
+import mkv_info.media_library
+
+pytest.importorskip("pyarrow")
+
+import mkv_info.parquet  # noqa: E402
+
+DATA_DIR = Path("data")
+
+
+def test_round_trip(library, tmp_path) -> None:
+    counts = mkv_info.parquet.write_dataset(library, tmp_path, batch_size=3)
+    assert counts["movie"] == len(library.movies)
+    assert counts["episode"] == sum(len(s.episodes) for s in library.series)
+    for table in ("entries", "streams"):
+        for kind in mkv_info.parquet.KINDS:
+            assert (tmp_path / table / f"kind={kind}").is_dir()
+
+    restored = mkv_info.parquet.read_database(tmp_path, batch_size=2)
+    assert restored.movies == library.movies
+    assert [s.title for s in restored.series] == [
+        s.title for s in library.series
+    ]
+    for original, copy in zip(library.series, restored.series):
+        assert copy.episodes == original.episodes
+    assert [m.path for m in restored.movies] == [
+        m.path for m in library.movies
+    ]
+
+
+def test_streaming_source(library, tmp_path) -> None:
+    entries = mkv_info.library_xml.XML_Parser.iter_entries(
+        DATA_DIR / "videodb_min.xml"
+    )
+    mkv_info.parquet.write_dataset(entries, tmp_path)
+    episodes = [
+        entry
+        for show, entry in mkv_info.parquet.read_entries(
+            tmp_path, kinds=("episode",)
+        )
+    ]
+    assert episodes == [e for s in library.series for e in s.episodes]
+
+
+def test_bitrate_columns(tmp_path) -> None:
+    estimate = mkv_info.media_library.BitrateEstimate(4e6, 3.5e6, 4.5e6, 8)
+    movie = mkv_info.media_library.Movie(
+        title="Sample",
+        streams=mkv_info.media_library.StreamDetails(
+            videos=(
+                mkv_info.media_library.VideoStream(
+                    codec="hevc", width=1920, height=1080, bitrate=estimate
+                ),
+            ),
+            subs=(mkv_info.media_library.SubStream(language="eng"),),
+        ),
+    )
+    database = mkv_info.media_library.VideoDatabase(movies=[movie], series=[])
+    mkv_info.parquet.write_dataset(database, tmp_path)
+    (restored,) = mkv_info.parquet.read_database(tmp_path).movies
+    assert restored == movie
+    assert restored.streams.videos[0].bitrate == estimate
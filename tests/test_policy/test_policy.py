@@ -0,0 +1,88 @@
+import pytest
+
+import mkv_info.media_library
+import mkv_info.policy
+
+
+def test_rules_match_naive_loops(library, entries) -> None:
+    P = mkv_info.policy
+    engine = P.PolicyEngine(
+        [
+            P.require_audio_language("eng audio", "eng"),
+            P.require_sub_language("dutch subs", "dut"),
+            P.min_video_height("at least 720p", 720),
+            P.min_video_height("at least 1080p", 1080, scope="movie"),
+            P.forbid_video_codec("no mpeg2", "mpeg2video"),
+            P.predicate(
+                "has runtime", lambda entry: entry.duration is not None
+            ),
+        ]
+    )
+    report = engine.evaluate(library)
+    by_entry = {id(v.entry): set(v.rules) for v in report.violations}
+
+    for entry in entries:
+        expected = set()
+        if not any(a.language == "eng" for a in entry.audio_streams):
+            expected.add("eng audio")
+        if not any(s.language == "dut" for s in entry.sub_streams):
+            expected.add("dutch subs")
+        heights = [v.height for v in entry.video_streams if v.height]
+        if heights and min(heights) < 720:
+            expected.add("at least 720p")
+        if (
+            isinstance(entry, mkv_info.media_library.Movie)
+            and heights
+            and min(heights) < 1080
+        ):
+            expected.add("at least 1080p")
+        if entry.duration is None:
+            expected.add("has runtime")
+        assert by_entry.get(id(entry), set()) == expected
+
+    assert report.counts["at least 1080p"] > 0
+    assert "no mpeg2" in report.unmatched
+    assert "at least 1080p" not in report.unmatched
+    assert engine.last_matched["no mpeg2"] is None
+    assert engine.last_matched["at least 1080p"] == 1
+
+
+def test_season_audio_layout() -> None:
+    ML = mkv_info.media_library
+
+    def episode(number, channels):
+        return ML.Episode(
+            season=1,
+            episode=number,
+            streams=ML.StreamDetails(
+                audios=(ML.AudioStream("ac3", "eng", channels),)
+            ),
+        )
+
+    odd = episode(3, 2)
+    library = ML.VideoDatabase(
+        movies=[],
+        series=[
+            ML.Series(
+                title="Show", episodes=[episode(1, 6), episode(2, 6), odd]
+            )
+        ],
+    )
+    engine = mkv_info.policy.PolicyEngine(
+        [mkv_info.policy.season_shares_audio_layout("same audio")]
+    )
+    report = engine.evaluate(library)
+    assert [(v.entry, v.rules) for v in report.violations] == [
+        (odd, ["same audio"])
+    ]
+    assert report.unmatched == []
+
+
+def test_duplicate_names() -> None:
+    with pytest.raises(ValueError):
+        mkv_info.policy.PolicyEngine(
+            [
+                mkv_info.policy.min_video_height("rule", 720),
+                mkv_info.policy.min_video_width("rule", 1280),
+            ]
+        )
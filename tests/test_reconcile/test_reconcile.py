@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import mkv_info.reconcile
+
+
+def test_paths_are_parsed(library) -> None:
+    movie = library.movies[0]
+    assert movie.path == (
+        "K:\\Library_Bluray\\films\\2001 - A Space Odyssey (1968)\\"
+    )
+    assert movie.filename_and_path.endswith(
+        "2001 - A Space Odyssey (1968).nfo"
+    )
+    episode = library.series[0].episodes[0]
+    assert episode.filename_and_path.endswith(
+        "Game of Thrones - S01E01 - Winter Is Coming.mkv"
+    )
+
+
+def test_path_mapping() -> None:
+    mapping = mkv_info.reconcile.PathMapping.from_strings(
+        [
+            "K:\\Library_Bluray\\=/mnt/bluray/",
+            "k:\\library_bluray\\series\\=/tv",
+        ]
+    )
+    assert mapping("K:\\Library_Bluray\\films\\Cars (2006)\\Cars.mkv") == (
+        "/mnt/bluray/films/Cars (2006)/Cars.mkv"
+    )
+    assert mapping("K:\\Library_Bluray\\series\\GoT\\S01E01.mkv") == (
+        "/tv/GoT/S01E01.mkv"
+    )
+    assert mapping("/already/local.mkv") == "/already/local.mkv"
+    assert mapping(None) is None
+
+
+def test_reconcile(library, tmp_path) -> None:
+    mapping = mkv_info.reconcile.PathMapping(
+        [("K:\\Library_Bluray\\", str(tmp_path))]
+    )
+    movie = Path(mapping(library.movies[1].filename_and_path))
+    movie.parent.mkdir(parents=True)
+    movie.write_bytes(b"nfo")
+    movie.with_suffix(".mkv").write_bytes(b"matroska")
+    episode = Path(mapping(library.series[0].episodes[0].filename_and_path))
+    episode.parent.mkdir(parents=True)
+    episode.write_bytes(b"")
+    orphan = episode.parent / "Game of Thrones - S09E01 - Unknown.mkv"
+    orphan.write_bytes(b"matroska")
+    (episode.parent / "notes.txt").write_text("not media")
+
+    report = mkv_info.reconcile.reconcile(
+        library, mapping=mapping, roots=[tmp_path], jobs=4
+    )
+    assert [s.entry for s in report.present] == [library.movies[1]]
+    assert report.present[0].size == 3
+    assert [s.entry for s in report.empty] == [
+        library.series[0].episodes[0]
+    ]
+    total = len(library.movies) + sum(len(s.episodes) for s in library.series)
+    assert len(report.missing) + len(report.unmapped) == total - 2
+    assert all(
+        e.filename_and_path.startswith("K:\\Library_BR_SD\\")
+        for e in report.unmapped
+    )
+    assert report.orphans == [str(orphan)]
+
+    report = mkv_info.reconcile.reconcile(library)
+    assert len(report.unmapped) == total
@@ -0,0 +1,91 @@
+import gzip
+import random
+import statistics
+from pathlib import Path
+
+import pytest
+
+import mkv_info.media_library
+import mkv_info.sampling
+
+DATA_DIR = Path("data")
+
+
+def _is_movie(entry):
+    return isinstance(entry, mkv_info.media_library.Movie)
+
+
+def _audio_tracks(entry):
+    return len(entry.streams.audios)
+
+
+def _minutes(entry):
+    return entry.duration.total_seconds() / 60
+
+
+def test_estimates_cover_truth(entries) -> None:
+    sample = mkv_info.sampling.sample_entries(
+        DATA_DIR / "videodb_min.xml", 400, seed=1
+    )
+    assert len(sample.entries) == 400
+
+    share = sample.proportion(_is_movie)
+    truth = sum(map(_is_movie, entries)) / len(entries)
+    assert share.low <= truth <= share.high
+    assert 0 <= share.low <= share.value <= share.high <= 1
+
+    tracks = sample.mean(_audio_tracks)
+    assert tracks.low <= statistics.mean(map(_audio_tracks, entries))
+    assert statistics.mean(map(_audio_tracks, entries)) <= tracks.high
+
+    p95 = sample.quantile(_minutes, 0.95)
+    runtimes = sorted(map(_minutes, entries))
+    assert p95.low <= runtimes[int(0.95 * len(runtimes))] <= p95.high
+
+
+def test_precision_grows_with_sample_size() -> None:
+    path = DATA_DIR / "videodb_min.xml"
+    small = mkv_info.sampling.sample_entries(path, 30, seed=1)
+    large = mkv_info.sampling.sample_entries(path, 600, seed=1)
+    width = [
+        s.mean(_audio_tracks).high - s.mean(_audio_tracks).low
+        for s in (small, large)
+    ]
+    assert width[1] < width[0]
+
+
+def test_domain_excludes_none() -> None:
+    sample = mkv_info.sampling.sample_entries(
+        DATA_DIR / "videodb_min.xml", 200, seed=3
+    )
+    estimate = sample.mean(lambda e: e.year if _is_movie(e) else None)
+    assert estimate.n == sum(map(_is_movie, sample.entries))
+    assert 1960 < estimate.value < 2010
+
+
+def test_sample_size() -> None:
+    assert mkv_info.sampling.sample_size(0.05) == 385
+    assert mkv_info.sampling.sample_size(0.01, proportion=0.1) == 3458
+    with pytest.raises(ValueError):
+        mkv_info.sampling.sample_size(0)
+
+
+def test_rejects_compressed(tmp_path) -> None:
+    path = tmp_path / "videodb.xml.gz"
+    plain = (DATA_DIR / "videodb_min.xml").read_bytes()
+    path.write_bytes(gzip.compress(plain))
+    with pytest.raises(ValueError):
+        mkv_info.sampling.sample_entries(path, 10)
+
+
+def test_previous_start_matches_full_search() -> None:
+    data = (DATA_DIR / "videodb_min.xml").read_bytes()
+    starts = [
+        m.start() for m in mkv_info.sampling.START_PATTERN.finditer(data)
+    ]
+    rng = random.Random(0)
+    for position in [0, starts[0], starts[-1], len(data)] + [
+        rng.randrange(len(data)) for _ in range(200)
+    ]:
+        expected = max((s for s in starts if s < position), default=-1)
+        assert mkv_info.sampling._previous_start(data, position) == expected
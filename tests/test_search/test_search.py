@@ -0,0 +1,63 @@
+import pytest
+
+import mkv_info.search
+
+
+@pytest.fixture()
+def index(library):
+    return mkv_info.search.TitleIndex.from_database(library)
+
+
+def test_search(index) -> None:
+    match = index.search("clockwork orang", k=1)[0]
+    assert match.document == mkv_info.search.Document(
+        "movie", "A Clockwork Orange", 1971
+    )
+    match = index.search("2001 space odyssey", k=1)[0]
+    assert match.document.title == "2001: A Space Odyssey"
+    assert index.search("game of throne", kinds={"series"})[0].document == (
+        mkv_info.search.Document("series", "Game of Thrones", 2011)
+    )
+    episode = index.search("mhysa", k=1)[0].document
+    assert (episode.kind, episode.show, episode.season, episode.episode) == (
+        "episode",
+        "Game of Thrones",
+        3,
+        10,
+    )
+    assert index.search("zzzzzz") == []
+
+
+def test_pruning_matches_full_scan(index) -> None:
+    documents = list(index._documents.values())
+    for query in ("the kingsroad", "barry lindon", "winter coming"):
+        grams = mkv_info.search.ngrams(query)
+        expected = sorted(
+            (
+                2 * len(grams & mkv_info.search.ngrams(d.title))
+                / (len(grams) + len(mkv_info.search.ngrams(d.title)))
+                for d in documents
+            ),
+            reverse=True,
+        )
+        expected = [score for score in expected if score >= 0.3][:5]
+        found = [m.score for m in index.search(query, k=5, min_score=0.3)]
+        assert found == pytest.approx(expected)
+
+
+def test_add_remove(index, tmp_path) -> None:
+    document = mkv_info.search.Document("movie", "Cars", 2006)
+    assert document in index
+    index.remove(document)
+    assert document not in index
+    assert all(m.document != document for m in index.search("cars"))
+    index.add(document)
+    assert index.search("cars", k=1)[0].document == document
+
+    path = tmp_path / "videodb.index"
+    index.save(path)
+    loaded = mkv_info.search.TitleIndex.load(path)
+    assert len(loaded) == len(index)
+    assert loaded.search("clockwork") == index.search("clockwork")
+    loaded.add(mkv_info.search.Document("movie", "Cars 2", 2011))
+    assert len(loaded) == len(index) + 1
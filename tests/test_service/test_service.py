@@ -0,0 +1,153 @@
+import http.client
+import json
+import socket
+import threading
+import urllib.request
+
+import pytest
+
+import mkv_info.service
+
+
+@pytest.fixture()
+def service(library):
+    return mkv_info.service.LibraryService(lambda: library, cache_size=4)
+
+
+@pytest.fixture()
+def server(service):
+    server = mkv_info.service.make_server(service, ("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%d" % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_titles(service) -> None:
+    (match, *_) = service.query("/titles", {"q": ["space odysey"]})
+    assert match["title"] == "2001: A Space Odyssey"
+    assert match["kind"] == "movie"
+    with pytest.raises(mkv_info.service.ServiceError) as error:
+        service.query("/titles", {})
+    assert error.value.status == 400
+
+
+def test_entry_filters(service) -> None:
+    rows = service.query(
+        "/entries",
+        {"kind": ["episode"], "show": ["game of thrones"], "limit": ["1000"]},
+    )
+    assert rows and all(row["show"] == "Game of Thrones" for row in rows)
+    hd = service.query(
+        "/entries", {"resolution": ["1080p"], "limit": ["1000"]}
+    )
+    assert all(row["height"] >= 1000 or row["width"] >= 1800 for row in hd)
+    eng = service.query("/entries", {"language": ["ENG"], "limit": ["1000"]})
+    assert all("eng" in row["audio_languages"] for row in eng)
+    both = service.query(
+        "/entries",
+        {"language": ["eng"], "resolution": ["1080p"], "limit": ["1000"]},
+    )
+    assert {r["path"] for r in both} == {r["path"] for r in hd} & {
+        r["path"] for r in eng
+    }
+
+
+def test_seasons(service) -> None:
+    listing = service.query("/seasons", {"show": ["Game of Thrones"]})
+    assert [s["season"] for s in listing["seasons"]] == [1, 2, 3]
+    with pytest.raises(mkv_info.service.ServiceError) as error:
+        service.query("/seasons", {"show": ["Nope"]})
+    assert error.value.status == 404
+
+
+def test_cache_is_invalidated_on_reload(service) -> None:
+    params = {"q": ["clockwork"]}
+    first = service.query("/titles", params)
+    assert service.query("/titles", params) is first
+    assert (service.hits, service.misses) == (1, 1)
+    assert service.reload() == 1
+    assert service.query("/titles", params) is not first
+    assert service.misses == 2
+    for query in ("a", "b", "c", "d", "e"):
+        service.query("/titles", {"q": [query]})
+    assert service.metrics()["cache"]["size"] == 4
+
+
+def test_http(server) -> None:
+    with urllib.request.urlopen(server + "/titles?q=barry+lyndon") as reply:
+        assert json.load(reply)[0]["title"] == "Barry Lyndon"
+
+    def fetch(_):
+        with urllib.request.urlopen(server + "/entries?codec=h264") as reply:
+            return len(json.load(reply))
+
+    threads = [threading.Thread(target=fetch, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    request = urllib.request.Request(server + "/reload", method="POST")
+    with urllib.request.urlopen(request) as reply:
+        assert json.load(reply) == {"generation": 1}
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(server + "/missing")
+    assert error.value.code == 404
+
+    with urllib.request.urlopen(server + "/metrics") as reply:
+        metrics = json.load(reply)
+    assert metrics["generation"] == 1
+    assert metrics["endpoints"]["/entries"]["count"] == 8
+    assert metrics["endpoints"]["/titles"]["p95_ms"] >= 0
+    assert "/missing" not in metrics["endpoints"]
+
+
+def test_unix_socket(service, tmp_path) -> None:
+    path = tmp_path / "mkv_info.sock"
+    server = mkv_info.service.make_server(service, path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        connection = http.client.HTTPConnection("localhost")
+        connection.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.sock.connect(str(path))
+        connection.request("GET", "/seasons?show=game+of+thrones")
+        reply = connection.getresponse()
+        assert reply.status == 200
+        assert json.load(reply)["show"] == "Game of Thrones"
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_failed_reload_keeps_serving(library) -> None:
+    calls = []
+
+    def loader():
+        calls.append(None)
+        if len(calls) > 1:
+            raise OSError("export is being written")
+        return library
+
+    service = mkv_info.service.LibraryService(loader)
+    server = mkv_info.service.make_server(service, ("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = "http://127.0.0.1:%d" % server.server_address[1]
+    try:
+        request = urllib.request.Request(url + "/reload", method="POST")
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(request)
+        assert error.value.code == 500
+        assert "export is being written" in json.load(error.value)["error"]
+        with urllib.request.urlopen(url + "/titles?q=barry") as reply:
+            assert json.load(reply)[0]["title"] == "Barry Lyndon"
+        metrics = service.metrics()
+        assert metrics["generation"] == 0
+        assert metrics["endpoints"]["/reload"]["count"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,61 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+import pytest
+
+import mkv_info.shared
+
+
+def _count_audio_tracks(name: str) -> int:
+    with mkv_info.shared.attach(name) as shared:
+        return sum(
+            len(list(episode.audio_streams))
+            for series in shared.series
+            for episode in series.episodes
+        ) + sum(len(list(movie.audio_streams)) for movie in shared.movies)
+
+
+def test_round_trip(library) -> None:
+    with mkv_info.shared.publish(library) as published:
+        with mkv_info.shared.attach(published.name) as shared:
+            assert shared.materialize() == library
+            assert len(shared.movies) == len(library.movies)
+            movie = shared.movies[-1]
+            assert movie.kind == "movie"
+            assert movie.title == library.movies[-1].title
+            assert movie.duration == library.movies[-1].duration
+            episode = shared.series[0].episodes[0]
+            assert episode.kind == "episode"
+            assert episode.season == library.series[0].episodes[0].season
+            with pytest.raises(IndexError):
+                shared.movies[len(library.movies)]
+            with pytest.raises(TypeError):
+                shared.buffer[0] = 0
+
+
+def test_workers(library) -> None:
+    expected = sum(
+        len(movie.streams.audios) for movie in library.movies
+    ) + sum(
+        len(episode.streams.audios)
+        for series in library.series
+        for episode in series.episodes
+    )
+    with mkv_info.shared.publish(library) as published:
+        context = multiprocessing.get_context("fork")
+        with context.Pool(2) as pool:
+            counts = pool.map(_count_audio_tracks, [published.name] * 4)
+    assert counts == [expected] * 4
+
+
+@pytest.mark.parametrize("size", [16, 4096])
+def test_rejects_foreign_segment(size) -> None:
+    segment = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        memory = shared_memory.SharedMemory(name=segment.name)
+        with pytest.raises(ValueError):
+            mkv_info.shared.SharedLibrary(memory)
+        assert memory.buf is None
+    finally:
+        segment.close()
+        segment.unlink()
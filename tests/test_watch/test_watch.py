@@ -0,0 +1,250 @@
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import mkv_info.watch
+
+MOVIE_NFO = "<movie><title>{title}</title><year>2006</year></movie>"
+EPISODE_NFO = (
+    "<episodedetails><title>{title}</title><showtitle>Game of Thrones"
+    "</showtitle><season>1</season><episode>{episode}</episode>"
+    "</episodedetails>"
+)
+
+
+def _write_episode(season: Path, episode: int, title: str) -> Path:
+    path = season / f"S01E{episode:02d}.nfo"
+    path.write_text(EPISODE_NFO.format(title=title, episode=episode))
+    (season / f"S01E{episode:02d}.mkv").write_bytes(b"")
+    return path
+
+
+def test_apply(tmp_path) -> None:
+    movie = tmp_path / "Cars (2006).nfo"
+    movie.write_text(MOVIE_NFO.format(title="Cars"))
+    season = tmp_path / "Game of Thrones" / "Season01"
+    season.mkdir(parents=True)
+    first = _write_episode(season, 1, "Winter Is Coming")
+
+    watcher = mkv_info.watch.LibraryWatcher(tmp_path)
+    notified = []
+    watcher.subscribe(notified.append)
+    changes = watcher.scan()
+    assert [c.action for c in changes] == ["added", "added"]
+    assert notified == [changes]
+    database = watcher.database
+    assert [m.title for m in database.movies] == ["Cars"]
+    assert database.series[0].title == "Game of Thrones"
+    assert [e.title for e in database.series[0].episodes] == [
+        "Winter Is Coming"
+    ]
+
+    movie.write_text(MOVIE_NFO.format(title="Cars 2"))
+    second = _write_episode(season, 2, "The Kingsroad")
+    changes = watcher.apply([str(movie), str(second.with_suffix(".mkv"))])
+    assert sorted(c.action for c in changes) == ["added", "replaced"]
+    assert [m.title for m in database.movies] == ["Cars 2"]
+    assert len(database.series[0].episodes) == 2
+
+    assert watcher.apply([str(movie)]) == []
+
+    movie.unlink()
+    first.unlink()
+    second.unlink()
+    changes = watcher.apply([str(movie), str(first), str(second)])
+    assert [c.action for c in changes] == ["removed"] * 3
+    assert database.movies == []
+    assert database.series == []
+
+
+def test_polling_backend(tmp_path) -> None:
+    backend = mkv_info.watch.PollingBackend(tmp_path)
+    path = tmp_path / "movie.nfo"
+    path.write_text(MOVIE_NFO.format(title="Cars"))
+    assert backend.read(0) == {str(path)}
+    assert backend.read(0) == set()
+    path.unlink()
+    assert backend.read(0) == {str(path)}
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is linux only"
+)
+def test_inotify_backend(tmp_path) -> None:
+    backend = mkv_info.watch.InotifyBackend(tmp_path)
+    try:
+        (tmp_path / "movie.nfo").write_text("<movie/>")
+        nested = tmp_path / "new" / "Season01"
+        nested.mkdir(parents=True)
+        (nested / "episode.nfo").write_text("<episodedetails/>")
+        changed = set()
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline and len(changed) < 2:
+            changed |= backend.read(0.1)
+        assert str(tmp_path / "movie.nfo") in changed
+        (nested / "late.nfo").write_text("<episodedetails/>")
+        assert str(nested / "late.nfo") in backend.read(1)
+    finally:
+        backend.close()
+
+
+def test_run_debounces(tmp_path) -> None:
+    watcher = mkv_info.watch.LibraryWatcher(
+        tmp_path,
+        backend=mkv_info.watch.PollingBackend(tmp_path),
+        debounce=0.05,
+    )
+    batches = []
+    watcher.subscribe(batches.append)
+    stop = threading.Event()
+    thread = threading.Thread(target=watcher.run, args=(stop,))
+    thread.start()
+    try:
+        for index in range(20):
+            (tmp_path / f"movie{index}.nfo").write_text(
+                MOVIE_NFO.format(title=f"Movie {index}")
+            )
+        deadline = time.monotonic() + 5
+        movies = watcher.database.movies
+        while time.monotonic() < deadline and len(movies) < 20:
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        thread.join()
+    assert len(watcher.database.movies) == 20
+    assert sum(len(batch) for batch in batches) == 20
+    assert len(batches) < 20
+
+
+def _wait(predicate, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return predicate()
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is linux only"
+)
+def test_directory_rename_and_move_out(tmp_path) -> None:
+    library = tmp_path / "lib"
+    (library / "Cars").mkdir(parents=True)
+    (library / "Cars" / "Cars.nfo").write_text(MOVIE_NFO.format(title="Cars"))
+    outside = tmp_path / "outside"
+    outside.mkdir()
+
+    watcher = mkv_info.watch.LibraryWatcher(
+        library,
+        backend=mkv_info.watch.InotifyBackend(library),
+        debounce=0.05,
+    )
+    watcher.scan()
+    stop = threading.Event()
+    thread = threading.Thread(target=watcher.run, args=(stop,))
+    thread.start()
+    try:
+        renamed = library / "Cars (2006)"
+        (library / "Cars").rename(renamed)
+        assert _wait(
+            lambda: list(watcher._entries) == [str(renamed / "Cars.nfo")]
+        )
+        assert [m.title for m in watcher.database.movies] == ["Cars"]
+
+        (renamed / "Cars.nfo").write_text(MOVIE_NFO.format(title="Cars 2"))
+        assert _wait(
+            lambda: [m.title for m in watcher.database.movies] == ["Cars 2"]
+        )
+
+        renamed.rename(outside / "Cars (2006)")
+        assert _wait(lambda: watcher.database.movies == [])
+        assert watcher._entries == {}
+        (outside / "Cars (2006)" / "Cars.nfo").write_text(
+            MOVIE_NFO.format(title="Cars 3")
+        )
+        time.sleep(0.3)
+        assert watcher.database.movies == []
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_existing_database_is_not_duplicated(tmp_path) -> None:
+    movie = tmp_path / "Cars.nfo"
+    movie.write_text(MOVIE_NFO.format(title="Cars"))
+    first = mkv_info.watch.LibraryWatcher(tmp_path)
+    first.scan()
+
+    watcher = mkv_info.watch.LibraryWatcher(tmp_path, first.database)
+    assert watcher.scan() == []
+    assert [m.title for m in watcher.database.movies] == ["Cars"]
+
+
+def test_unreadable_nfo_is_skipped(tmp_path) -> None:
+    (tmp_path / "folder.nfo").mkdir()
+    (tmp_path / "Cars.nfo").write_text(MOVIE_NFO.format(title="Cars"))
+    watcher = mkv_info.watch.LibraryWatcher(tmp_path)
+    watcher.scan()
+    assert watcher.apply([str(tmp_path / "folder.nfo")]) == []
+    assert [m.title for m in watcher.database.movies] == ["Cars"]
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is linux only"
+)
+def test_vanished_directory_is_skipped(tmp_path) -> None:
+    backend = mkv_info.watch.InotifyBackend(tmp_path)
+    try:
+        transient = tmp_path / ".rsync-partial"
+        transient.mkdir()
+        transient.rmdir()
+        backend.read(0.2)
+        (tmp_path / "movie.nfo").write_text("<movie/>")
+        assert str(tmp_path / "movie.nfo") in backend.read(1)
+    finally:
+        backend.close()
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is linux only"
+)
+def test_rescan_watches_new_directories(tmp_path) -> None:
+    backend = mkv_info.watch.InotifyBackend(tmp_path)
+    try:
+        season = tmp_path / "Game of Thrones" / "Season01"
+        season.mkdir(parents=True)
+        (season / "S01E01.nfo").write_text("<episodedetails/>")
+        while True:
+            try:
+                os.read(backend._fd, 1 << 16)
+            except BlockingIOError:
+                break
+        assert str(season / "S01E01.nfo") in backend._rescan()
+        (season / "S01E02.nfo").write_text("<episodedetails/>")
+        assert str(season / "S01E02.nfo") in backend.read(1)
+    finally:
+        backend.close()
+
+
+def test_expand_tracks_entries(tmp_path) -> None:
+    season = tmp_path / "Game of Thrones" / "Season01"
+    season.mkdir(parents=True)
+    first = _write_episode(season, 1, "Winter Is Coming")
+    watcher = mkv_info.watch.LibraryWatcher(tmp_path)
+    watcher.scan()
+    second = _write_episode(season, 2, "The Kingsroad")
+    watcher.apply([str(second)])
+    show = str(season.parent)
+    assert watcher.expand([show, str(season / "poster.jpg")]) == {
+        str(first),
+        str(second),
+    }
+    first.unlink()
+    watcher.apply([str(first)])
+    assert watcher.expand([show]) == {str(second)}
+    assert watcher._paths == sorted(watcher._entries)
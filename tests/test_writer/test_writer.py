@@ -0,0 +1,214 @@
+import dataclasses
+import io
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import mkv_info.library_dir
+import mkv_info.library_writer
+import mkv_info.library_xml
+import mkv_info.media_library
+
+DATA_DIR = Path("data")
+
+
+def test_round_trip(library, tmp_path) -> None:
+    target = tmp_path / "videodb.xml"
+    mkv_info.library_writer.write_video_database(library, target)
+    restored = mkv_info.library_xml.XML_Parser.parse_file(target)
+    assert restored == library
+    assert [m.filename_and_path for m in restored.movies] == [
+        m.filename_and_path for m in library.movies
+    ]
+
+
+def test_streaming_source(library) -> None:
+    stream = io.StringIO()
+    mkv_info.library_writer.write_video_database(
+        mkv_info.library_xml.XML_Parser.iter_entries(
+            DATA_DIR / "videodb_min.xml"
+        ),
+        stream,
+    )
+    restored = mkv_info.library_xml.XML_Parser.parse_file(
+        io.BytesIO(stream.getvalue().encode("utf-8"))
+    )
+    assert restored == library
+
+
+def test_escaping(tmp_path) -> None:
+    movie = mkv_info.media_library.Movie(title="Tom & Jerry <Uncut>")
+    target = tmp_path / "movie.nfo"
+    mkv_info.library_writer.write_nfo(movie, target)
+    assert "Tom &amp; Jerry &lt;Uncut&gt;" in target.read_text()
+    _, restored = mkv_info.library_dir.parse_nfo(target)
+    assert restored == movie
+
+
+def test_nfo_files(library, tmp_path) -> None:
+    series = library.series[0]
+    episodes = []
+    for episode in series.episodes[:2]:
+        media = tmp_path / f"S{episode.season:02}E{episode.episode:02}.mkv"
+        episodes.append(
+            dataclasses.replace(episode, filename_and_path=str(media))
+        )
+    source = [dataclasses.replace(series, episodes=episodes)]
+    written = mkv_info.library_writer.write_nfo_files(source)
+    assert written == [
+        str(tmp_path / "S01E01.nfo"),
+        str(tmp_path / "S01E02.nfo"),
+    ]
+    for path, episode in zip(written, episodes):
+        show, restored = mkv_info.library_dir.parse_nfo(path)
+        assert show == series.title
+        assert restored == episode
+
+
+def test_nfo_files_keep_existing_metadata(tmp_path) -> None:
+    target = tmp_path / "Cars.nfo"
+    target.write_text(
+        "<movie>\n"
+        "    <title>Cars</title>\n"
+        "    <plot>Lightning McQueen</plot>\n"
+        '    <uniqueid type="tmdb">920</uniqueid>\n'
+        "    <fileinfo><streamdetails /></fileinfo>\n"
+        "    <actor><name>Owen Wilson</name></actor>\n"
+        "</movie>\n"
+    )
+    movie = mkv_info.media_library.Movie(
+        title="Cars",
+        filename_and_path=str(target),
+        streams=mkv_info.media_library.StreamDetails(
+            videos=(mkv_info.media_library.VideoStream("hevc", 1920, 800),)
+        ),
+    )
+    written = mkv_info.library_writer.write_nfo_files([movie])
+    assert written == [str(target)]
+    text = target.read_text()
+    assert "<plot>Lightning McQueen</plot>" in text
+    assert "<name>Owen Wilson</name>" in text
+    assert text.count("<fileinfo>") == 1
+    _, restored = mkv_info.library_dir.parse_nfo(target)
+    assert restored.streams == movie.streams
+
+    unrelated = tmp_path / "Up.nfo"
+    unrelated.write_text("https://www.themoviedb.org/movie/14160\n")
+    up = dataclasses.replace(
+        movie, title="Up", filename_and_path=str(unrelated)
+    )
+    assert mkv_info.library_writer.write_nfo_files([up]) == []
+    assert mkv_info.library_writer.write_nfo_files([up], overwrite=True) == [
+        str(unrelated)
+    ]
+    assert "themoviedb" not in unrelated.read_text()
+
+
+def test_splice_nfo_picks_matching_episode(library, tmp_path) -> None:
+    first, second = library.series[0].episodes[:2]
+    target = tmp_path / "double.nfo"
+    with open(target, "w") as stream:
+        mkv_info.library_writer.write_nfo(first, stream)
+        mkv_info.library_writer.write_nfo(second, stream)
+    text = target.read_text().replace(mkv_info.library_writer.DECLARATION, "")
+    target.write_text(f"<root>{text}</root>")
+    remuxed = dataclasses.replace(
+        second,
+        streams=mkv_info.media_library.StreamDetails(
+            audios=(mkv_info.media_library.AudioStream("opus", "ger", 2),)
+        ),
+    )
+    assert mkv_info.library_writer.splice_nfo(target, remuxed)
+    blocks = [
+        mkv_info.library_xml.XML_Parser.parse_episode(element)
+        for element in ET.parse(target).getroot()
+    ]
+    assert blocks == [first, remuxed]
+
+
+def test_splice_without_updates_is_verbatim(tmp_path) -> None:
+    source = DATA_DIR / "videodb_min.xml"
+    target = tmp_path / "videodb.xml"
+    report = mkv_info.library_writer.splice_fileinfo(source, target, [])
+    assert report.replaced == 0
+    assert target.read_bytes() == source.read_bytes()
+
+
+def test_splice_fileinfo(library, tmp_path) -> None:
+    source = DATA_DIR / "videodb_min.xml"
+    target = tmp_path / "videodb.xml"
+    remuxed = mkv_info.media_library.StreamDetails(
+        videos=(mkv_info.media_library.VideoStream("hevc", 3840, 2160),),
+        audios=(mkv_info.media_library.AudioStream("eac3", "eng", 8),),
+    )
+    movie = dataclasses.replace(library.movies[0], streams=remuxed)
+    series = library.series[0]
+    episode = dataclasses.replace(series.episodes[1], streams=remuxed)
+    missing = mkv_info.media_library.Movie(title="Not There", year=1900)
+    updates = [
+        movie,
+        missing,
+        dataclasses.replace(series, episodes=[episode]),
+    ]
+
+    report = mkv_info.library_writer.splice_fileinfo(source, target, updates)
+    duplicates = [
+        e for e in series.episodes if (e.season, e.episode) == (1, 2)
+    ]
+    assert report.replaced == 1 + len(duplicates)
+    assert report.unmatched == [("not there", 1900)]
+
+    original = source.read_bytes()
+    spliced = target.read_bytes()
+    head = original.index(b"<fileinfo>")
+    assert spliced[:head] == original[:head]
+    assert spliced.endswith(original[original.rindex(b"</fileinfo>") :])
+    assert b"<plot>Humanity finds" in spliced
+
+    restored = mkv_info.library_xml.XML_Parser.parse_file(target)
+    assert restored.movies[0].streams == remuxed
+    assert restored.movies[1:] == library.movies[1:]
+    for before, after in zip(series.episodes, restored.series[0].episodes):
+        if (before.season, before.episode) == (1, 2):
+            assert after.streams == remuxed
+        else:
+            assert after == before
+    assert restored.series[1:] == library.series[1:]
+
+
+def test_splice_keeps_unmodeled_stream_children(library, tmp_path) -> None:
+    source = DATA_DIR / "videodb_min.xml"
+    target = tmp_path / "videodb.xml"
+    report = mkv_info.library_writer.splice_fileinfo(
+        source, target, library
+    )
+    assert report.replaced > 0
+    assert target.read_bytes() == source.read_bytes()
+
+    movie = library.movies[0]
+    video, *_ = movie.streams.videos
+    first, *rest = movie.streams.audios
+    streams = mkv_info.media_library.StreamDetails(
+        videos=(dataclasses.replace(video, width=1916, codec=None),),
+        audios=(
+            *rest,
+            mkv_info.media_library.AudioStream("opus", "ger", 2),
+        ),
+        subs=movie.streams.subs[:1],
+    )
+    changed = dataclasses.replace(movie, streams=streams)
+    mkv_info.library_writer.splice_fileinfo(source, target, [changed])
+    element = ET.parse(target).getroot().find("movie")
+    details = element.find("fileinfo/streamdetails")
+    (video_element,) = details.findall("video")
+    assert video_element.find("codec") is None
+    assert video_element.findtext("width") == "1916"
+    original = ET.parse(source).getroot().find("movie")
+    for name in ("aspect", "durationinseconds"):
+        expected = original.findtext(f"fileinfo/streamdetails/video/{name}")
+        assert video_element.findtext(name) == expected
+    assert [s.findtext("primary") for s in details.findall("subtitle")] == [
+        original.findtext("fileinfo/streamdetails/subtitle/primary")
+    ]
+    restored = mkv_info.library_xml.XML_Parser.parse_movie(element)
+    assert restored.streams == streams
+    assert restored.duration == movie.duration
@@ -0,0 +1,78 @@
+import bz2
+import gzip
+import io
+import lzma
+from pathlib import Path
+
+import pytest
+
+import mkv_info.compressed
+import mkv_info.library_xml
+
+DATA_DIR = Path("data")
+
+CODECS = {
+    "gz": gzip.compress,
+    "xz": lzma.compress,
+    "bz2": bz2.compress,
+}
+
+
+class _Pipe(io.RawIOBase):
+    def __init__(self, data: bytes):
+        self._stream = io.BytesIO(data)
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size=-1) -> bytes:
+        return self._stream.read(min(size, 4096) if size > 0 else 4096)
+
+
+@pytest.fixture(scope="module")
+def plain() -> bytes:
+    return (DATA_DIR / "videodb_min.xml").read_bytes()
+
+
+@pytest.fixture(scope="module")
+def expected():
+    return mkv_info.library_xml.XML_Parser.parse_file(
+        DATA_DIR / "videodb_min.xml"
+    )
+
+
+def test_parse_file_matches_tree(expected) -> None:
+    root = mkv_info.library_xml.ET.parse(DATA_DIR / "videodb_min.xml")
+    assert expected == mkv_info.library_xml.XML_Parser.parse_video_database(
+        root.getroot()
+    )
+
+
+@pytest.mark.parametrize("suffix", CODECS)
+def test_compressed_path(tmp_path, plain, expected, suffix) -> None:
+    path = tmp_path / f"videodb.xml.{suffix}"
+    path.write_bytes(CODECS[suffix](plain))
+    assert mkv_info.library_xml.XML_Parser.parse_file(path) == expected
+
+
+@pytest.mark.parametrize("suffix", CODECS)
+def test_compressed_file_object(plain, expected, suffix) -> None:
+    data = CODECS[suffix](plain)
+    parse_file = mkv_info.library_xml.XML_Parser.parse_file
+    assert parse_file(io.BytesIO(data)) == expected
+    assert parse_file(_Pipe(data)) == expected
+
+
+def test_zstd(tmp_path, plain, expected) -> None:
+    zstandard = pytest.importorskip("zstandard")
+    path = tmp_path / "videodb.xml.zst"
+    path.write_bytes(zstandard.ZstdCompressor().compress(plain))
+    assert mkv_info.library_xml.XML_Parser.parse_file(path) == expected
+
+
+def test_detect_codec() -> None:
+    detect = mkv_info.compressed.detect_codec
+    assert detect(io.BufferedReader(io.BytesIO(b"<videodb/>"))) is None
+    assert detect(io.BufferedReader(io.BytesIO(gzip.compress(b"")))) == "gzip"
+    assert detect(io.BufferedReader(io.BytesIO(lzma.compress(b"")))) == "xz"
+    assert detect(io.BufferedReader(io.BytesIO(bz2.compress(b"")))) == "bz2"
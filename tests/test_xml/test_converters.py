@@ -0,0 +1,82 @@
+import datetime
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import mkv_info.library_xml
+
+
+@pytest.mark.parametrize(
+    "text, minutes",
+    [
+        ("149", 149),
+        ("63 min", 63),
+        (" 53 min ", 53),
+        ("90 minutes", 90),
+        ("1h 02m", 62),
+        ("2h", 120),
+        ("01:02:00", 62),
+        ("1:05", 65),
+    ],
+)
+def test_runtime_formats(text, minutes) -> None:
+    assert mkv_info.library_xml.to_duration(text) == datetime.timedelta(
+        minutes=minutes
+    )
+
+
+@pytest.mark.parametrize(
+    "text", ["", "unknown", "-5", "1h02", "90 minutes approx", "abc 5m"]
+)
+def test_runtime_unparseable(text) -> None:
+    assert mkv_info.library_xml.to_duration(text) is None
+
+
+@pytest.mark.parametrize("runtime", ["", "90 minutes approx"])
+def test_duration_in_seconds_fallback(runtime) -> None:
+    data = ET.fromstring(
+        f"""
+        <movie>
+            <title>No Runtime</title>
+            <runtime>{runtime}</runtime>
+            <fileinfo>
+                <streamdetails>
+                    <video><durationinseconds>8932</durationinseconds></video>
+                </streamdetails>
+            </fileinfo>
+        </movie>
+        """
+    )
+    movie = mkv_info.library_xml.XML_Parser.parse_movie(data)
+    assert movie.duration == datetime.timedelta(seconds=8932)
+
+
+def test_values_are_shared() -> None:
+    parser = mkv_info.library_xml.XML_Parser
+    parser.cache_clear()
+    audios = [
+        parser.parse_audio_stream(
+            ET.fromstring(
+                "<audio><codec>ac3</codec><language>eng</language>"
+                "<channels>6</channels></audio>"
+            )
+        )
+        for _ in range(3)
+    ]
+    assert audios[0].language is audios[2].language
+    stats = parser.cache_stats()
+    assert stats["language"].hits == 2
+    assert stats["language"].misses == 1
+    assert stats["channels"].currsize == 1
+
+
+def test_register_converter() -> None:
+    class Parser(mkv_info.library_xml.XML_Parser):
+        pass
+
+    Parser.register_converter("codec", str.upper, maxsize=4)
+    stream = ET.fromstring("<video><codec>hevc</codec></video>")
+    assert Parser.parse_video_stream(stream).codec == "HEVC"
+    base = mkv_info.library_xml.XML_Parser.parse_video_stream(stream)
+    assert base.codec == "hevc"
+    assert Parser.cache_stats()["codec"].maxsize == 4